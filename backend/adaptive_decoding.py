@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+
+# --------------------------- COST MODEL ---------------------------
+class DecodingCostModel:
+    """
+    Running throughput estimates for one model, used to choose a decoding
+    configuration that fits a latency budget.
+
+    Encoder cost is modelled as input tokens / encode_rate and decoder cost
+    as max_length * num_beams / decode_rate, both per sequence. Concurrent
+    generate calls share the CPU, so the estimate is scaled by (1 + queue depth).
+    Rates are exponentially smoothed from measured calls via record().
+    """
+
+    def __init__(self, decode_rate=40.0, encode_rate=2000.0, smoothing=0.2, min_max_length=8):
+        self.decode_rate = decode_rate
+        self.encode_rate = encode_rate
+        self.smoothing = smoothing
+        self.min_max_length = min_max_length
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        """Count a generate call as in flight while the block runs."""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def record(self, input_tokens, generated_tokens, num_beams, seconds, batch_size=1):
+        """Update the decode rate from one measured generate call."""
+        encode_seconds = batch_size * input_tokens / self.encode_rate
+        decode_seconds = max(seconds - encode_seconds, 1e-3)
+        observed = batch_size * generated_tokens * max(1, num_beams) / decode_seconds
+        with self._lock:
+            self.decode_rate += self.smoothing * (observed - self.decode_rate)
+
+    def blend(self, decode_rate):
+        """Smooth in a decode rate measured by another cost model (e.g. in a worker process)."""
+        with self._lock:
+            self.decode_rate += self.smoothing * (decode_rate - self.decode_rate)
+
+    def estimate(self, input_tokens, max_length, num_beams, queue_depth=0):
+        """Expected seconds for one sequence."""
+        seconds = input_tokens / self.encode_rate + max_length * max(1, num_beams) / self.decode_rate
+        return seconds * (1 + queue_depth)
+
+    def plan(self, input_tokens, params, deadline, queue_depth=None):
+        """
+        Return (params, decision) for a request that should finish within
+        deadline seconds. Beam width is reduced first; if even a single beam
+        at the requested max_length is too slow, greedy decoding with a
+        shortened max_length is used.
+        """
+        if queue_depth is None:
+            queue_depth = self.in_flight
+        requested_beams = params.get("num_beams", 1)
+        max_length = params["max_length"]
+
+        beams = requested_beams
+        while beams >= 1:
+            estimate = self.estimate(input_tokens, max_length, beams, queue_depth)
+            if estimate <= deadline:
+                break
+            beams = beams - 1 if beams > 2 else beams // 2
+        chosen = dict(params)
+
+        if beams >= 1:
+            chosen["num_beams"] = beams
+        else:
+            # Greedy fallback: longest output that still fits the budget
+            decode_budget = deadline / (1 + queue_depth) - input_tokens / self.encode_rate
+            fitted = int(decode_budget * self.decode_rate)
+            chosen["num_beams"] = 1
+            chosen["max_length"] = max(self.min_max_length, min(max_length, fitted))
+            estimate = self.estimate(input_tokens, chosen["max_length"], 1, queue_depth)
+
+        if "min_length" in chosen:
+            chosen["min_length"] = min(chosen["min_length"], chosen["max_length"])
+        if chosen["num_beams"] == 1:
+            chosen.pop("length_penalty", None)
+
+        decision = {
+            "deadline": deadline,
+            "queue_depth": queue_depth,
+            "input_tokens": input_tokens,
+            "num_beams": chosen["num_beams"],
+            "max_length": chosen["max_length"],
+            "min_length": chosen.get("min_length"),
+            "greedy": chosen["num_beams"] == 1,
+            "degraded": chosen["num_beams"] < requested_beams or chosen["max_length"] < max_length,
+            "estimated_seconds": round(estimate, 3),
+        }
+        return chosen, decision
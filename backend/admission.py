@@ -0,0 +1,141 @@
+import os
+import math
+import time
+import threading
+
+# --------------------------- CONFIG ---------------------------
+# Token-work admitted at once: estimated input tokens plus max_length * beams
+# of every request being served or waiting for the inference executor
+ADMISSION_MAX_TOKEN_WORK = int(os.getenv("ADMISSION_MAX_TOKEN_WORK", "20000"))
+# Share of that limit bulk work (batch endpoint) may use; the rest is kept for
+# interactive requests, so bulk work is shed first under load
+ADMISSION_BULK_RATIO = float(os.getenv("ADMISSION_BULK_RATIO", "0.5"))
+# Rough characters per token, used to estimate input size without tokenizing
+CHARS_PER_TOKEN = 4
+
+INTERACTIVE, BULK = "interactive", "bulk"
+
+def estimate_work(text, max_length=100, num_beams=1):
+    """Token-work of one generation: input tokens plus decoded positions over all beams."""
+    return len(text) // CHARS_PER_TOKEN + 1 + max_length * max(1, num_beams)
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Over capacity, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class WorkTooLarge(Exception):
+    """The request alone exceeds the limit for its priority; retrying cannot help."""
+    def __init__(self, work, limit):
+        super().__init__(f"Request work {work} exceeds the limit of {limit}")
+        self.work = work
+        self.limit = limit
+
+# --------------------------- CONTROLLER ---------------------------
+class AdmissionController:
+    """
+    Tracks the token-work in flight and admits new work only while it fits
+    under the limit for its priority. Drain throughput is smoothed from
+    released work and turned into a Retry-After hint for rejected callers.
+    """
+
+    def __init__(self, max_work=ADMISSION_MAX_TOKEN_WORK, bulk_ratio=ADMISSION_BULK_RATIO, smoothing=0.2):
+        self.max_work = max_work
+        self.limits = {INTERACTIVE: max_work, BULK: int(max_work * bulk_ratio)}
+        self.smoothing = smoothing
+        self.in_flight_work = 0
+        self.in_flight_requests = 0
+        self.drain_rate = None
+        self.admitted = {INTERACTIVE: 0, BULK: 0}
+        self.rejected = {INTERACTIVE: 0, BULK: 0}
+        self._lock = threading.Lock()
+
+    def retry_after(self, work, priority):
+        """Seconds until enough work should have drained for this request to fit."""
+        excess = self.in_flight_work + work - self.limits[priority]
+        if excess <= 0 or not self.drain_rate:
+            return 1
+        # drain_rate is per request (its latency includes queueing), so the
+        # server as a whole drains roughly that times the requests in flight
+        return max(1, math.ceil(excess / (self.drain_rate * max(1, self.in_flight_requests))))
+
+    def too_large(self, work, priority=INTERACTIVE):
+        return work > self.limits[priority]
+
+    def fits(self, work, priority=INTERACTIVE):
+        return self.in_flight_work + work <= self.limits[priority]
+
+    def _reject_oversized(self, work, priority):
+        # Never admitted, not even on an idle server: one such generate call
+        # can exhaust memory on its own
+        if self.too_large(work, priority):
+            self.rejected[priority] += 1
+            raise WorkTooLarge(work, self.limits[priority])
+
+    def check(self, work, priority=INTERACTIVE):
+        """
+        Raise AdmissionRejected (and count it) if work would not be admitted
+        now, or WorkTooLarge if it never would.
+        """
+        with self._lock:
+            self._reject_oversized(work, priority)
+            if not self.fits(work, priority):
+                self.rejected[priority] += 1
+                raise AdmissionRejected(self.retry_after(work, priority))
+
+    def try_acquire(self, work, priority=INTERACTIVE):
+        """Admit work and return a ticket, or raise AdmissionRejected/WorkTooLarge."""
+        with self._lock:
+            self._reject_oversized(work, priority)
+            if not self.fits(work, priority):
+                self.rejected[priority] += 1
+                raise AdmissionRejected(self.retry_after(work, priority))
+            return self._reserve(work, priority)
+
+    def acquire_if_fits(self, work, priority=INTERACTIVE):
+        """
+        Admit work and return a ticket, or None; for callers that wait and
+        retry instead of failing. Raises WorkTooLarge if it can never fit.
+        """
+        with self._lock:
+            self._reject_oversized(work, priority)
+            if not self.fits(work, priority):
+                return None
+            return self._reserve(work, priority)
+
+    def _reserve(self, work, priority):
+        self.in_flight_work += work
+        self.in_flight_requests += 1
+        self.admitted[priority] += 1
+        return (work, time.monotonic())
+
+    def release(self, ticket):
+        work, started = ticket
+        elapsed = max(time.monotonic() - started, 1e-3)
+        with self._lock:
+            self.in_flight_work -= work
+            self.in_flight_requests -= 1
+            observed = work / elapsed
+            if self.drain_rate is None:
+                self.drain_rate = observed
+            else:
+                self.drain_rate += self.smoothing * (observed - self.drain_rate)
+
+    def stats(self):
+        return {
+            "in_flight_work": self.in_flight_work,
+            "in_flight_requests": self.in_flight_requests,
+            "max_work": self.max_work,
+            "bulk_limit": self.limits[BULK],
+            "drain_rate": round(self.drain_rate, 1) if self.drain_rate else None,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
+
+_controller = None
+
+def get_admission_controller():
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import Future
+
+# --------------------------- MICRO-BATCH SCHEDULER ---------------------------
+class _PendingRequest:
+    def __init__(self, text):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatchScheduler:
+    """
+    Collect single-text requests arriving from many threads and run the ones
+    with identical generation parameters as one padded batch.
+
+    batch_fn(texts, **params) must return one result per text, in order.
+    A batch is dispatched as soon as it holds max_batch_size requests or its
+    oldest request has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=5):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._worker = None
+        self.batches_run = 0
+        self.requests_run = 0
+
+    @staticmethod
+    def _params_key(params):
+        return tuple(sorted(params.items()))
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name="micro-batch-scheduler", daemon=True)
+            self._worker.start()
+
+    def submit(self, text, **params):
+        """Queue one text and return a Future resolving to its result."""
+        request = _PendingRequest(text)
+        key = self._params_key(params)
+        with self._cond:
+            self._ensure_worker()
+            self._pending.setdefault(key, []).append(request)
+            self._cond.notify_all()
+        return request.future
+
+    def run(self, text, **params):
+        """Blocking helper: queue the text and wait for its result."""
+        return self.submit(text, **params).result()
+
+    def pending_count(self):
+        """Number of requests waiting to be batched."""
+        with self._cond:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def stats(self):
+        return {
+            "batches_run": self.batches_run,
+            "requests_run": self.requests_run,
+            "avg_batch_size": self.requests_run / self.batches_run if self.batches_run else 0.0,
+            "pending": self.pending_count(),
+        }
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            # Serve the group whose oldest request has waited longest
+            key, queue = min(self._pending.items(), key=lambda item: item[1][0].enqueued_at)
+            deadline = queue[0].enqueued_at + self.max_wait
+            while len(queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = queue[:self.max_batch_size]
+            del queue[:self.max_batch_size]
+            if not queue:
+                del self._pending[key]
+        return dict(key), batch
+
+    def _loop(self):
+        while True:
+            params, batch = self._next_batch()
+            try:
+                results = self.batch_fn([request.text for request in batch], **params)
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} inputs")
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            self.batches_run += 1
+            self.requests_run += len(batch)
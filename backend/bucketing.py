@@ -0,0 +1,103 @@
+import os
+import time
+import bisect
+import threading
+
+# --------------------------- CONFIG ---------------------------
+# Upper token-length edges of the buckets; longer sequences share the last bucket
+BUCKET_BOUNDARIES = tuple(
+    int(edge) for edge in os.getenv("BUCKET_BOUNDARIES", "16,32,64,128,256,512").split(",")
+)
+
+# --------------------------- PADDING METRICS ---------------------------
+class PaddingStats:
+    """Counts real tokens versus padded slots of every batch sent to a model."""
+
+    def __init__(self):
+        self.batches = 0
+        self.sequences = 0
+        self.real_tokens = 0
+        self.padded_slots = 0
+        self._lock = threading.Lock()
+
+    def record(self, lengths):
+        with self._lock:
+            self.batches += 1
+            self.sequences += len(lengths)
+            self.real_tokens += sum(lengths)
+            self.padded_slots += max(lengths) * len(lengths)
+
+    def merge(self, counts):
+        """Add counters recorded elsewhere, e.g. in a forked worker process."""
+        with self._lock:
+            self.batches += counts["batches"]
+            self.sequences += counts["sequences"]
+            self.real_tokens += counts["real_tokens"]
+            self.padded_slots += counts["padded_slots"]
+
+    @property
+    def padding_ratio(self):
+        """Share of computed positions that were padding."""
+        if not self.padded_slots:
+            return 0.0
+        return 1.0 - self.real_tokens / self.padded_slots
+
+    def snapshot(self):
+        return {
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "real_tokens": self.real_tokens,
+            "padded_slots": self.padded_slots,
+            "padding_ratio": round(self.padding_ratio, 4),
+        }
+
+_padding_stats = {}
+_padding_lock = threading.Lock()
+
+def get_padding_stats(name):
+    """Padding counters for one model, created on first use."""
+    with _padding_lock:
+        if name not in _padding_stats:
+            _padding_stats[name] = PaddingStats()
+        return _padding_stats[name]
+
+def padding_metrics():
+    return {name: stats.snapshot() for name, stats in _padding_stats.items()}
+
+# --------------------------- BUCKETING ---------------------------
+def length_buckets(lengths, max_batch_size, boundaries=BUCKET_BOUNDARIES):
+    """
+    Group sequence indices into batches of similar length: sort by length,
+    split at the bucket boundaries, then cut each bucket into batches of at
+    most max_batch_size.
+    """
+    buckets = {}
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        bucket = bisect.bisect_left(boundaries, lengths[index])
+        buckets.setdefault(bucket, []).append(index)
+
+    batches = []
+    for bucket in sorted(buckets):
+        members = buckets[bucket]
+        for start in range(0, len(members), max_batch_size):
+            batches.append(members[start:start + max_batch_size])
+    return batches
+
+def run_bucketed(items, lengths, batch_fn, max_batch_size, stats=None, on_batch=None):
+    """
+    Run batch_fn over length-bucketed batches of items and return its outputs
+    in the original item order. batch_fn takes a list of items and returns
+    one output per item. on_batch, if given, is called as
+    on_batch(batch_lengths, seconds) after every batch (it may raise to abort).
+    """
+    results = [None] * len(items)
+    for batch in length_buckets(lengths, max(1, max_batch_size)):
+        started = time.perf_counter()
+        outputs = batch_fn([items[i] for i in batch])
+        if stats is not None:
+            stats.record([lengths[i] for i in batch])
+        if on_batch is not None:
+            on_batch([lengths[i] for i in batch], time.perf_counter() - started)
+        for index, output in zip(batch, outputs):
+            results[index] = output
+    return results
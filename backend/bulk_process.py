@@ -0,0 +1,185 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from itertools import islice
+
+# --------------------------- CONFIG ---------------------------
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "32"))
+# Progress is checkpointed (and reported) after this many rows
+BULK_CHECKPOINT_EVERY = int(os.getenv("BULK_CHECKPOINT_EVERY", "256"))
+
+# --------------------------- INPUT ---------------------------
+def read_records(path):
+    """Stream dict records from a CSV (header row) or JSONL file, one at a time."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+# --------------------------- OUTPUT ---------------------------
+class RecordWriter:
+    """
+    Appends result records to a JSONL or CSV file (picked by extension).
+    Output written after the last checkpoint is cut off on resume, so rows
+    are never duplicated.
+    """
+
+    def __init__(self, path, resume_offset=None):
+        self.path = path
+        self.is_csv = path.endswith(".csv")
+        self._csv = None
+        if resume_offset is None:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+        else:
+            self._file = open(path, "r+", encoding="utf-8", newline="")
+            self._file.seek(resume_offset)
+            self._file.truncate()
+        self._header_written = resume_offset is not None and resume_offset > 0
+
+    def write(self, record):
+        if not self.is_csv:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(self._file, fieldnames=list(record), extrasaction="ignore")
+            if not self._header_written:
+                self._csv.writeheader()
+        self._csv.writerow(record)
+
+    def sync(self):
+        """Flush to disk and return the file offset to checkpoint."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+# --------------------------- CHECKPOINT ---------------------------
+def checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+def load_checkpoint(output_path):
+    path = checkpoint_path(output_path)
+    if not os.path.isfile(path) or not os.path.isfile(output_path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(output_path, state):
+    """Write the checkpoint atomically so a kill mid-write leaves the old one intact."""
+    path = checkpoint_path(output_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# --------------------------- TASKS ---------------------------
+def make_task(task, level="Easy", max_length=100, num_beams=5, batch_size=BULK_BATCH_SIZE):
+    """Return a function mapping a list of texts to a list of outputs."""
+    if task == "summarize":
+        from summarization import summarize_texts_by_level
+        return lambda texts: summarize_texts_by_level(texts, level=level, batch_size=batch_size)
+    if task == "paraphrase":
+        from paraphrasing import generate_paraphrase_batch
+        return lambda texts: generate_paraphrase_batch(texts, max_length=max_length, num_beams=num_beams,
+                                                       batch_size=batch_size)
+    raise ValueError(f"Unknown task: {task}")
+
+# --------------------------- RUN ---------------------------
+def run_bulk(input_path, output_path, process, text_field, output_field,
+             batch_size=BULK_BATCH_SIZE, checkpoint_every=BULK_CHECKPOINT_EVERY, resume=True):
+    """
+    Stream records from input_path through process() batch by batch and
+    append each record with its output_field to output_path. Only one batch
+    is held in memory. Progress is checkpointed every checkpoint_every rows;
+    with resume, a previous run's checkpoint is picked up and finished rows
+    are skipped. Returns a stats dict.
+    """
+    state = load_checkpoint(output_path) if resume else None
+    if state is None:
+        state = {"input": os.path.abspath(input_path), "rows_done": 0, "output_offset": 0}
+    elif state["input"] != os.path.abspath(input_path):
+        raise ValueError(f"Checkpoint for {output_path} belongs to {state['input']}")
+    else:
+        print(f"🔹 Resuming after {state['rows_done']} rows")
+
+    writer = RecordWriter(output_path, resume_offset=state["output_offset"] if state["rows_done"] else None)
+    records = islice(read_records(input_path), state["rows_done"], None)
+    started = time.perf_counter()
+    processed = skipped = 0
+    since_checkpoint = 0
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            texts = [str(record.get(text_field) or "") for record in batch]
+            todo = [i for i, text in enumerate(texts) if text.strip()]
+            outputs = process([texts[i] for i in todo]) if todo else []
+            results = dict(zip(todo, outputs))
+            for i, record in enumerate(batch):
+                record[output_field] = results.get(i, "")
+                writer.write(record)
+            processed += len(batch)
+            skipped += len(batch) - len(todo)
+            since_checkpoint += len(batch)
+
+            if since_checkpoint >= checkpoint_every:
+                state["rows_done"] += since_checkpoint
+                state["output_offset"] = writer.sync()
+                save_checkpoint(output_path, state)
+                since_checkpoint = 0
+                elapsed = time.perf_counter() - started
+                print(f"Rows {state['rows_done']} - {processed / elapsed:.2f} rows/sec")
+
+        state["rows_done"] += since_checkpoint
+        state["output_offset"] = writer.sync()
+        state["complete"] = True
+        save_checkpoint(output_path, state)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows_processed": processed,
+        "rows_skipped_empty": skipped,
+        "rows_total": state["rows_done"],
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(processed / elapsed, 3) if elapsed else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or paraphrase a CSV/JSONL file in bulk")
+    parser.add_argument("task", choices=["summarize", "paraphrase"])
+    parser.add_argument("input", help="CSV (with header) or JSONL file, e.g. data/test_clean.csv")
+    parser.add_argument("output", help="JSONL or CSV file; appended to when resuming")
+    parser.add_argument("--text-field", default="dialogue_clean")
+    parser.add_argument("--output-field", help="defaults to 'summary' or 'paraphrase'")
+    parser.add_argument("--level", default="Easy", help="summary level (Easy, Medium, Long)")
+    parser.add_argument("--max-length", type=int, default=100, help="paraphrase max_length")
+    parser.add_argument("--num-beams", type=int, default=5, help="paraphrase beam width")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--checkpoint-every", type=int, default=BULK_CHECKPOINT_EVERY)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    process = make_task(args.task, level=args.level, max_length=args.max_length,
+                        num_beams=args.num_beams, batch_size=args.batch_size)
+    output_field = args.output_field or ("summary" if args.task == "summarize" else "paraphrase")
+    stats = run_bulk(args.input, args.output, process, args.text_field, output_field,
+                     batch_size=args.batch_size, checkpoint_every=args.checkpoint_every,
+                     resume=not args.restart)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import re
+from array import array
+import xxhash
+
+# --------------------------- SENTENCES ---------------------------
+# Sentence end: terminal punctuation plus any closing quotes/brackets, which
+# stay with the sentence, followed by whitespace; or a line break
+SENTENCE_END = re.compile(r"[.!?]+[\"'\u201d\u2019)\]]*(?=\s)|\n+")
+LAST_WORD = re.compile(r"[^\s\"'(\[\u201c\u2018]*$")
+ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e", "cf",
+    "fig", "figs", "no", "nos", "vol", "ch", "sec", "p", "pp", "ed", "eds", "approx", "dept",
+    "inc", "ltd", "co", "corp", "a.m", "p.m", "jan", "feb", "mar", "apr", "jun", "jul", "aug",
+    "sep", "sept", "oct", "nov", "dec",
+})
+
+def is_abbreviation(text, end):
+    """True if the period ending at text[end] closes an abbreviation rather than a sentence."""
+    word = LAST_WORD.search(text, 0, end).group().lower()
+    if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+        return True
+    # "3 p.m. today": a sentence does not go on in lower case
+    following = text[end + 1:].lstrip()[:1]
+    return following.islower()
+
+def split_sentences(text):
+    """
+    Split text at sentence ends and line breaks, dropping empty pieces.
+    Closing quotes and brackets stay with their sentence, and periods after
+    common abbreviations and initials do not end a sentence.
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.group() == "." and is_abbreviation(text, match.start()):
+            continue
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+# --------------------------- TOKENIZED DOCUMENT ---------------------------
+class TokenizedDocument:
+    """
+    A text tokenized exactly once, sentence by sentence. The per-sentence input
+    ids are reused for length checks, chunking and batching, so nothing has to
+    be decoded back to a string and re-tokenized.
+    """
+
+    def __init__(self, text, tokenizer):
+        self.text = text
+        self.sentences = split_sentences(text)
+        if self.sentences:
+            self.sentence_ids = tokenizer(self.sentences, add_special_tokens=False)["input_ids"]
+        else:
+            self.sentence_ids = []
+        self.eos_token_id = tokenizer.eos_token_id
+        self.pad_token_id = tokenizer.pad_token_id
+        self.num_tokens = sum(len(ids) for ids in self.sentence_ids)
+
+    def __len__(self):
+        return self.num_tokens
+
+    def subset(self, indices):
+        """A document made of the given sentences, reusing their input ids."""
+        document = object.__new__(TokenizedDocument)
+        document.sentences = [self.sentences[i] for i in indices]
+        document.sentence_ids = [self.sentence_ids[i] for i in indices]
+        document.text = " ".join(document.sentences)
+        document.eos_token_id = self.eos_token_id
+        document.pad_token_id = self.pad_token_id
+        document.num_tokens = sum(len(ids) for ids in document.sentence_ids)
+        return document
+
+    def input_ids(self, max_tokens=None):
+        """Whole document as model input ids (truncated to max_tokens, eos appended)."""
+        ids = [token for sentence in self.sentence_ids for token in sentence]
+        return self._finish(ids, max_tokens)
+
+    def _finish(self, ids, max_tokens):
+        if max_tokens is not None:
+            ids = ids[:max_tokens - 1]
+        return ids + [self.eos_token_id]
+
+    def chunks(self, max_tokens=512, overlap_tokens=0):
+        """
+        Pack whole sentences into chunks of at most max_tokens input ids
+        (eos included). Each chunk starts with up to overlap_tokens worth of
+        trailing sentences from the previous chunk. A single sentence longer
+        than the budget is split at the budget.
+        """
+        budget = max_tokens - 1
+        chunks = []
+        current = []
+        current_len = 0
+
+        def flush():
+            if current:
+                chunks.append(self._finish([t for s in current for t in s], None))
+
+        for ids in self.sentence_ids:
+            if len(ids) > budget:
+                flush()
+                for start in range(0, len(ids), budget):
+                    chunks.append(self._finish(ids[start:start + budget], None))
+                current, current_len = [], 0
+                continue
+
+            if current_len + len(ids) > budget:
+                flush()
+                carried, carried_len = [], 0
+                for previous in reversed(current):
+                    if carried_len + len(previous) > overlap_tokens or \
+                            carried_len + len(previous) + len(ids) > budget:
+                        break
+                    carried.insert(0, previous)
+                    carried_len += len(previous)
+                current, current_len = carried, carried_len
+
+            current.append(ids)
+            current_len += len(ids)
+
+        flush()
+        return chunks
+
+    def content_chunks(self, max_tokens=512, min_tokens=256, divisor=4):
+        """
+        Content-defined chunking: a chunk ends after a sentence whose id hash
+        is divisible by divisor, once the chunk holds at least min_tokens.
+        Boundaries depend only on nearby sentences, so editing one paragraph
+        changes the chunk around it and leaves the others byte-identical.
+        The max_tokens budget (eos included) still forces a cut, and an
+        oversized sentence is split at the budget as in chunks().
+        """
+        budget = max_tokens - 1
+        min_tokens = min(min_tokens, budget)
+        chunks = []
+        current = []
+        current_len = 0
+
+        def flush():
+            if current:
+                chunks.append(self._finish([t for s in current for t in s], None))
+
+        for ids in self.sentence_ids:
+            if len(ids) > budget:
+                flush()
+                for start in range(0, len(ids), budget):
+                    chunks.append(self._finish(ids[start:start + budget], None))
+                current, current_len = [], 0
+                continue
+
+            if current_len + len(ids) > budget:
+                flush()
+                current, current_len = [], 0
+
+            current.append(ids)
+            current_len += len(ids)
+            if current_len >= min_tokens and sentence_hash(ids) % divisor == 0:
+                flush()
+                current, current_len = [], 0
+
+        flush()
+        return chunks
+
+def sentence_hash(ids):
+    """Stable hash of a sentence's input ids."""
+    return xxhash.xxh64_intdigest(array("i", ids).tobytes())
+
+# --------------------------- BATCHING ---------------------------
+def pad_id_batch(id_lists, pad_token_id):
+    """Right-pad id lists into input_ids / attention_mask tensors for generate."""
+    import torch
+    width = max(len(ids) for ids in id_lists)
+    input_ids = torch.full((len(id_lists), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(id_lists), width), dtype=torch.long)
+    for row, ids in enumerate(id_lists):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+    return input_ids, attention_mask
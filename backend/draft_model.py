@@ -0,0 +1,171 @@
+import sys
+import json
+import time
+import argparse
+
+# --------------------------- BUILD ---------------------------
+def evenly_spaced(count, keep):
+    """Indices of `keep` layers spread evenly over `count` (always keeps first and last)."""
+    if keep >= count:
+        return list(range(count))
+    if keep == 1:
+        return [count - 1]
+    return [round(i * (count - 1) / (keep - 1)) for i in range(keep)]
+
+def build_draft(source_path, output_path, encoder_layers=4, decoder_layers=2):
+    """
+    Make a draft model by trimming a fine-tuned Pegasus checkpoint (such as
+    the ./pegasus-samsum-manual directory written by train_model.py) to a few
+    evenly spaced encoder/decoder layers. Embeddings, vocabulary and
+    tokenizer stay identical, which assisted generation requires.
+    """
+    import torch
+    from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+
+    model = PegasusForConditionalGeneration.from_pretrained(source_path, local_files_only=True)
+    tokenizer = PegasusTokenizer.from_pretrained(source_path, local_files_only=True)
+
+    encoder, decoder = model.model.encoder, model.model.decoder
+    encoder.layers = torch.nn.ModuleList([encoder.layers[i] for i in evenly_spaced(len(encoder.layers), encoder_layers)])
+    decoder.layers = torch.nn.ModuleList([decoder.layers[i] for i in evenly_spaced(len(decoder.layers), decoder_layers)])
+    model.config.encoder_layers = len(encoder.layers)
+    model.config.decoder_layers = len(decoder.layers)
+    model.config.num_hidden_layers = len(encoder.layers)
+
+    model.save_pretrained(output_path)
+    tokenizer.save_pretrained(output_path)
+    print(f"✅ Draft model saved at {output_path} "
+          f"({model.config.encoder_layers} encoder / {model.config.decoder_layers} decoder layers)")
+    return model
+
+def finetune_draft(draft_path, train_csv, steps, batch_size=2, lr=5e-5):
+    """
+    Briefly fine-tune the trimmed draft on the cleaned SAMSum split so the
+    remaining layers adapt to their new neighbours (same setup as train_model.py).
+    """
+    import csv
+    import torch
+    from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+
+    tokenizer = PegasusTokenizer.from_pretrained(draft_path, local_files_only=True)
+    model = PegasusForConditionalGeneration.from_pretrained(draft_path, local_files_only=True)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    model.train()
+
+    with open(train_csv, "r", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("dialogue_clean") and row.get("summary_clean")]
+
+    for step in range(steps):
+        batch = [rows[(step * batch_size + i) % len(rows)] for i in range(batch_size)]
+        inputs = tokenizer([row["dialogue_clean"] for row in batch], truncation=True, padding="longest",
+                           max_length=256, return_tensors="pt")
+        labels = tokenizer([row["summary_clean"] for row in batch], truncation=True, padding="longest",
+                           max_length=64, return_tensors="pt").input_ids
+        labels[labels == tokenizer.pad_token_id] = -100
+
+        optimizer.zero_grad()
+        loss = model(**inputs, labels=labels).loss
+        loss.backward()
+        optimizer.step()
+        if step % 100 == 0:
+            print(f"Step {step} - Loss: {loss.item():.4f}")
+
+    model.eval()
+    model.save_pretrained(draft_path)
+
+# --------------------------- BENCHMARK ---------------------------
+class CallCounter:
+    """Counts forward calls of a model (one per decoding step)."""
+
+    def __init__(self, model):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, inputs, outputs):
+        self.calls += 1
+
+    def reset(self):
+        self.calls = 0
+
+    def remove(self):
+        self._handle.remove()
+
+def benchmark(model_path, draft_path, texts, max_length=60):
+    """
+    Greedy decoding with and without the draft model. Acceptance rate is the
+    share of draft-proposed tokens the main model kept: every verification
+    step of the main model yields one token of its own, so accepted tokens
+    are generated tokens minus main-model forward calls.
+    """
+    import torch
+    from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+
+    tokenizer = PegasusTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = PegasusForConditionalGeneration.from_pretrained(model_path, local_files_only=True).eval()
+    draft = PegasusForConditionalGeneration.from_pretrained(draft_path, local_files_only=True).eval()
+    main_calls, draft_calls = CallCounter(model), CallCounter(draft)
+
+    baseline_seconds = assisted_seconds = 0.0
+    proposed = accepted = identical = 0
+    for text in texts:
+        inputs = tokenizer([text], truncation=True, return_tensors="pt")
+        with torch.no_grad():
+            started = time.perf_counter()
+            baseline = model.generate(**inputs, max_length=max_length, num_beams=1)
+            baseline_seconds += time.perf_counter() - started
+
+            main_calls.reset()
+            draft_calls.reset()
+            started = time.perf_counter()
+            assisted = model.generate(**inputs, max_length=max_length, num_beams=1, assistant_model=draft)
+            assisted_seconds += time.perf_counter() - started
+
+        generated = assisted.shape[1] - 1
+        proposed += draft_calls.calls
+        accepted += max(0, generated - main_calls.calls)
+        identical += torch.equal(baseline, assisted)
+
+    main_calls.remove()
+    draft_calls.remove()
+    return {
+        "samples": len(texts),
+        "baseline_seconds": round(baseline_seconds, 3),
+        "assisted_seconds": round(assisted_seconds, 3),
+        "speedup": round(baseline_seconds / assisted_seconds, 3) if assisted_seconds else None,
+        "acceptance_rate": round(accepted / proposed, 3) if proposed else 0.0,
+        "identical_outputs": identical,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and benchmark draft models for speculative decoding")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = commands.add_parser("build", help="trim a fine-tuned checkpoint into a draft model")
+    build_cmd.add_argument("--source", default="./pegasus-samsum-manual", help="train_model.py output directory")
+    build_cmd.add_argument("--output", default="./pegasus-samsum-draft")
+    build_cmd.add_argument("--encoder-layers", type=int, default=4)
+    build_cmd.add_argument("--decoder-layers", type=int, default=2)
+    build_cmd.add_argument("--finetune-steps", type=int, default=0)
+    build_cmd.add_argument("--train-data", default="data/train_clean.csv")
+
+    bench_cmd = commands.add_parser("benchmark", help="measure acceptance rate and speedup")
+    bench_cmd.add_argument("--model", default="./pegasus-samsum-manual")
+    bench_cmd.add_argument("--draft", default="./pegasus-samsum-draft")
+    bench_cmd.add_argument("--samples", default="data/test_clean.csv")
+    bench_cmd.add_argument("--limit", type=int, default=20)
+    bench_cmd.add_argument("--max-length", type=int, default=60)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build_draft(args.source, args.output, args.encoder_layers, args.decoder_layers)
+        if args.finetune_steps:
+            finetune_draft(args.output, args.train_data, args.finetune_steps)
+        return 0
+
+    from onnx_engine import read_samples
+    result = benchmark(args.model, args.draft, read_samples(args.samples, limit=args.limit), args.max_length)
+    print(json.dumps(result, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import os
+import re
+import numpy as np
+
+# --------------------------- CONFIG ---------------------------
+# Similarity columns kept per scoring window (the most widespread words)
+EXTRACTIVE_MAX_FEATURES = int(os.getenv("EXTRACTIVE_MAX_FEATURES", "4096"))
+# Longer inputs are scored in windows of this many consecutive sentences, so
+# the pairwise similarity cost grows linearly with document length
+EXTRACTIVE_WINDOW_SENTENCES = int(os.getenv("EXTRACTIVE_WINDOW_SENTENCES", "1000"))
+
+# --------------------------- SENTENCE VECTORS ---------------------------
+WORD = re.compile(r"[a-z0-9']+")
+
+def tfidf_matrix(sentences, max_features=EXTRACTIVE_MAX_FEATURES):
+    """
+    L2-normalized TF-IDF rows, one per sentence. Norms use every word, but
+    only words found in at least two sentences become columns (at most
+    max_features, most widespread first): a word in one sentence only adds
+    to that sentence's similarity with itself.
+    """
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for word in WORD.findall(sentence.lower()):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+    n, size = len(sentences), len(vocabulary)
+    if not size:
+        return np.zeros((n, 1), dtype=np.float32)
+
+    # Sparse (sentence, word) pairs with their counts
+    pairs, counts = np.unique(np.array(rows, dtype=np.int64) * size + np.array(cols, dtype=np.int64),
+                              return_counts=True)
+    pair_rows, pair_cols = pairs // size, pairs % size
+    document_frequency = np.bincount(pair_cols, minlength=size)
+    idf = np.log((1.0 + n) / (1.0 + document_frequency)) + 1.0
+    weights = counts * idf[pair_cols]
+    norms = np.sqrt(np.bincount(pair_rows, weights=weights ** 2, minlength=n))
+
+    shared = np.flatnonzero(document_frequency > 1)
+    if len(shared) > max_features:
+        shared = shared[np.argsort(-document_frequency[shared], kind="stable")[:max_features]]
+    column = np.full(size, -1, dtype=np.int64)
+    column[shared] = np.arange(len(shared))
+    keep = column[pair_cols] >= 0
+
+    matrix = np.zeros((n, max(1, len(shared))), dtype=np.float32)
+    matrix[pair_rows[keep], column[pair_cols[keep]]] = weights[keep] / norms[pair_rows[keep]]
+    return matrix
+
+def similarity_matrix(sentences):
+    """Cosine similarity between every pair of sentences (zero diagonal)."""
+    vectors = tfidf_matrix(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    return similarity
+
+# --------------------------- SCORING ---------------------------
+def centrality_scores(similarity):
+    """Degree centrality: total similarity of each sentence to all others."""
+    return similarity.sum(axis=1)
+
+def textrank_scores(similarity, damping=0.85, iterations=50, tol=1e-6):
+    """PageRank over the sentence similarity graph (power iteration)."""
+    n = similarity.shape[0]
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with anything jump uniformly
+    transition = np.where(row_sums > 0, similarity / np.where(row_sums == 0, 1.0, row_sums), 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1.0 - damping) / n + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+SCORERS = {
+    "textrank": textrank_scores,
+    "centrality": centrality_scores,
+}
+
+def salience_scores(sentences, method="textrank", window=EXTRACTIVE_WINDOW_SENTENCES):
+    """
+    Score sentences window by window of consecutive sentences; each window's
+    scores are rescaled to mean 1 so windows compare with each other.
+    """
+    scorer = SCORERS[method]
+    window = max(1, window)
+    scores = np.zeros(len(sentences), dtype=np.float64)
+    for start in range(0, len(sentences), window):
+        part = scorer(similarity_matrix(sentences[start:start + window]))
+        mean = part.mean()
+        scores[start:start + len(part)] = part / mean if mean > 0 else part
+    return scores
+
+def select_salient(sentences, token_counts, token_budget, method="textrank"):
+    """
+    Indices (in original order) of the highest-scoring sentences whose token
+    counts fit token_budget. Sentences that would overflow are skipped so
+    shorter, lower-ranked ones can still fill the budget.
+    """
+    if not sentences:
+        return []
+    if method not in SCORERS:
+        raise ValueError(f"Unknown extractive method: {method}")
+    scores = salience_scores(sentences, method)
+    selected, used = [], 0
+    for index in np.argsort(-scores, kind="stable"):
+        if used + token_counts[index] <= token_budget:
+            selected.append(int(index))
+            used += token_counts[index]
+    return sorted(selected)
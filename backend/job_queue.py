@@ -0,0 +1,382 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+
+# --------------------------- CONFIG ---------------------------
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", os.path.join(os.path.dirname(__file__), "jobs.db"))
+# Finished results (and failed/cancelled records) are kept this long
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "86400"))
+# A running job whose worker has not reported for this long is requeued
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation was requested."""
+
+class JobLost(Exception):
+    """Raised inside a running job whose lease expired and was handed to another worker."""
+
+# --------------------------- QUEUE ---------------------------
+class JobQueue:
+    """
+    Durable job queue in a SQLite file, shared by the web tier (submit,
+    status, cancel) and any number of worker processes (claim, progress,
+    finish). Claims happen inside an immediate transaction, so two workers
+    never take the same job. Higher priority runs first, then oldest.
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_DB):
+        self.db_path = db_path
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    progress_done INTEGER NOT NULL DEFAULT 0,
+                    progress_total INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL,
+                    expires_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority DESC, created_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS worker_stats (
+                    worker TEXT PRIMARY KEY,
+                    stats TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def submit(self, kind, payload, priority=0):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, created_at) VALUES (?,?,?,?,?,?)",
+                (job_id, kind, json.dumps(payload), int(priority), QUEUED, time.time())
+            )
+        finally:
+            conn.close()
+        return job_id
+
+    def get(self, job_id):
+        """The job as a dict, or None if unknown or expired."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or (row["expires_at"] is not None and row["expires_at"] <= time.time()):
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job immediately; a running job is flagged and stops
+        at its next progress report. Returns the resulting status or None.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row["status"] == QUEUED:
+                conn.execute(
+                    "UPDATE jobs SET status=?, finished_at=?, expires_at=? WHERE id=?",
+                    (CANCELLED, now, now + JOB_RESULT_TTL, job_id)
+                )
+                status = CANCELLED
+            else:
+                if row["status"] == RUNNING:
+                    conn.execute("UPDATE jobs SET cancel_requested=1 WHERE id=?", (job_id,))
+                status = row["status"]
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return status
+
+    def claim(self, worker):
+        """Take the next queued job (requeueing jobs of dead workers first), or None."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status=?, worker=NULL WHERE status=? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, now - JOB_LEASE_SECONDS)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status=? ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status=?, worker=?, started_at=?, heartbeat_at=? WHERE id=?",
+                    (RUNNING, worker, now, now, row["id"])
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["worker"] = worker
+        return job
+
+    def heartbeat(self, job_id, worker):
+        """Refresh the lease of a running job; False once this worker no longer owns it."""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE jobs SET heartbeat_at=? WHERE id=? AND worker=? AND status=?",
+                (time.time(), job_id, worker, RUNNING)
+            ).rowcount > 0
+        finally:
+            conn.close()
+
+    def report_progress(self, job_id, worker, done, total):
+        """
+        Record progress and refresh the lease. Raises JobCancelled if
+        cancellation was requested and JobLost if another worker owns the job.
+        """
+        conn = self._connect()
+        try:
+            updated = conn.execute(
+                "UPDATE jobs SET progress_done=?, progress_total=?, heartbeat_at=? "
+                "WHERE id=? AND worker=? AND status=?",
+                (done, total, time.time(), job_id, worker, RUNNING)
+            ).rowcount
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id=?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if not updated:
+            raise JobLost(job_id)
+        if row["cancel_requested"]:
+            raise JobCancelled(job_id)
+
+    def finish(self, job_id, worker, status, result=None, error=None):
+        """Store the outcome; ignored (returns False) if worker no longer owns the job."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, finished_at=?, expires_at=? "
+                "WHERE id=? AND worker=? AND status=?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 now, now + JOB_RESULT_TTL, job_id, worker, RUNNING)
+            ).rowcount > 0
+        finally:
+            conn.close()
+
+    def save_worker_stats(self, worker, stats):
+        """Publish a worker's in-process metrics, which the web tier cannot see otherwise."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO worker_stats (worker, stats, updated_at) VALUES (?,?,?)",
+                (worker, json.dumps(stats), time.time())
+            )
+        finally:
+            conn.close()
+
+    def worker_stats(self):
+        """{worker: stats} of every worker that reported within the result TTL."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT worker, stats, updated_at FROM worker_stats WHERE updated_at > ?",
+                (time.time() - JOB_RESULT_TTL,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row["worker"]: dict(json.loads(row["stats"]), updated_at=row["updated_at"]) for row in rows}
+
+    def purge_expired(self):
+        conn = self._connect()
+        try:
+            return conn.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+        finally:
+            conn.close()
+
+    def counts(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+_job_queue = None
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
+
+# --------------------------- HANDLERS ---------------------------
+def run_summarize_job(payload, progress):
+    from summarization import (
+        MAX_INPUT_TOKENS, tokenize_document, get_level_params,
+        summarize_long_text, summarize_text_by_level,
+    )
+    level = payload.get("level", "Easy")
+    document = tokenize_document(payload["text"])
+    if document.num_tokens <= MAX_INPUT_TOKENS:
+        progress(0, 1)
+        summary = summarize_text_by_level(payload["text"], level)
+        progress(1, 1)
+    else:
+        summary = summarize_long_text(document, summary_params=get_level_params(level), progress=progress)
+    return {"summary": summary, "level": level}
+
+def run_paraphrase_job(payload, progress):
+    from paraphrasing import paraphrase_long_text_with_report
+    paraphrase, report = paraphrase_long_text_with_report(
+        payload["text"],
+        max_length=payload.get("max_length", 100),
+        progress=progress
+    )
+    return {"paraphrase": paraphrase, "report": report}
+
+JOB_HANDLERS = {
+    "summarize": run_summarize_job,
+    "paraphrase": run_paraphrase_job,
+}
+
+# --------------------------- WORKER ---------------------------
+def collect_worker_stats():
+    """Metrics kept in this worker process (long paraphrases only run here)."""
+    from paraphrasing import get_sentence_cache
+    from bucketing import padding_metrics
+    return {
+        "paraphrase_sentence_cache": get_sentence_cache().stats(),
+        "padding": padding_metrics(),
+    }
+
+def keep_lease(queue, job_id, worker, stop, interval):
+    """Heartbeat thread: refresh the job's lease until stop is set or the job is lost."""
+    while not stop.wait(interval):
+        try:
+            if not queue.heartbeat(job_id, worker):
+                return
+        except sqlite3.Error as e:
+            print(f"Job {job_id} heartbeat failed: {e}")
+
+def run_job(queue, job):
+    """
+    Run one claimed job to completion, failure or cancellation. A background
+    thread keeps the lease alive while the handler runs, so phases without
+    progress reports are not mistaken for a dead worker. Returns the status,
+    or "lost" if the job was handed to another worker meanwhile.
+    """
+    job_id, worker = job["id"], job["worker"]
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        queue.finish(job_id, worker, FAILED, error=f"Unknown job kind: {job['kind']}")
+        return FAILED
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=keep_lease,
+        args=(queue, job_id, worker, stop, JOB_LEASE_SECONDS / 3),
+        daemon=True
+    )
+    heartbeat.start()
+    try:
+        result = handler(job["payload"], lambda done, total: queue.report_progress(job_id, worker, done, total))
+        status, error = DONE, None
+    except JobLost:
+        return "lost"
+    except JobCancelled:
+        result, status, error = None, CANCELLED, None
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        result, status, error = None, FAILED, str(e)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if not queue.finish(job_id, worker, status, result=result, error=error):
+        return "lost"
+    return status
+
+def work(queue, worker=None, poll_interval=JOB_POLL_INTERVAL, max_jobs=None):
+    """Claim and run jobs until max_jobs have run (forever when None)."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"🔹 Job worker {worker} polling {queue.db_path}")
+    ran = 0
+    last_purge = 0.0
+    while max_jobs is None or ran < max_jobs:
+        if time.time() - last_purge > 60:
+            queue.purge_expired()
+            last_purge = time.time()
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        status = run_job(queue, job)
+        print(f"Job {job['id']} ({job['kind']}) - {status}")
+        try:
+            queue.save_worker_stats(worker, collect_worker_stats())
+        except sqlite3.Error as e:
+            print(f"Saving worker stats failed: {e}")
+        ran += 1
+    return ran
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background worker for queued summarization/paraphrase jobs")
+    parser.add_argument("--db", default=JOB_QUEUE_DB)
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+    parser.add_argument("--max-jobs", type=int, help="exit after this many jobs")
+    args = parser.parse_args(argv)
+    from summarization import SUMMARY_MAP_MODE, start_chunk_pool, shutdown_chunk_pool
+    if SUMMARY_MAP_MODE == "processes":
+        # Fork before the lease heartbeat threads exist
+        start_chunk_pool()
+    try:
+        work(JobQueue(args.db), poll_interval=args.poll_interval, max_jobs=args.max_jobs)
+    finally:
+        shutdown_chunk_pool()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
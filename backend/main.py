@@ -2,6 +2,9 @@
 from fastapi import FastAPI
 from routers.auth_routes import router as auth_router
 from routers.profile_routes import router as profile_router
+from routers.inference_routes import router as inference_router
+from routers.job_routes import router as job_router
+from summarization import SUMMARY_MAP_MODE, start_chunk_pool, shutdown_chunk_pool
 # from api.routers.auth_routes import router as auth_router
 # from api.routers.profile_routes import router as profile_router
 
@@ -10,6 +13,19 @@ app= FastAPI()
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(profile_router, prefix="/profile", tags=["profile"])
+app.include_router(inference_router, tags=["inference"])
+app.include_router(job_router, prefix="/jobs", tags=["jobs"])
+
+# The chunk pool is forked before the inference executor, micro-batcher or
+# model reaper start any threads
+@app.on_event("startup")
+def start_workers():
+    if SUMMARY_MAP_MODE == "processes":
+        start_chunk_pool()
+
+@app.on_event("shutdown")
+def stop_workers():
+    shutdown_chunk_pool()
 
 #security = HTTPBearer()
 
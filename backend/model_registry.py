@@ -0,0 +1,243 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from result_cache import directory_revision
+
+# ------------------- LOAD ENV -------------------
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+# Checkpoint directories, relative to the directory the server is started from
+SUMMARIZATION_MODEL_PATH = os.getenv("SUMMARIZATION_MODEL_PATH", "./pegasus-samsum-manual")
+PARAPHRASE_MODEL_PATH = os.getenv("PARAPHRASE_MODEL_PATH", "./pegasus-paraphraser")
+# Optional small draft models for speculative (assisted) decoding, built by draft_model.py
+SUMMARIZATION_DRAFT_MODEL_PATH = os.getenv("SUMMARIZATION_DRAFT_MODEL_PATH", "")
+PARAPHRASE_DRAFT_MODEL_PATH = os.getenv("PARAPHRASE_DRAFT_MODEL_PATH", "")
+# Optional tokenizer directory shared by every model (both checkpoints use the Pegasus vocab)
+SHARED_TOKENIZER_PATH = os.getenv("SHARED_TOKENIZER_PATH", "")
+# Unload models unused for this many seconds; 0 keeps them resident
+MODEL_IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", "0"))
+# "torch" (PyTorch eager) or "onnx" (ONNX Runtime with KV cache, see onnx_engine.py)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# "fp32" or "int8" (dynamically quantized variant published by quantize_models.py)
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "fp32")
+INT8_SUBDIR = "int8"
+# generate (and encoder) calls running at once across all models; each call
+# already uses every torch intra-op thread, so more only oversubscribes the CPU
+GENERATE_CONCURRENCY = int(os.getenv("GENERATE_CONCURRENCY", "2"))
+generate_slots = threading.BoundedSemaphore(max(1, GENERATE_CONCURRENCY))
+INT8_WEIGHTS = "pytorch_model_int8.pt"
+
+# ------------------- LOADERS -------------------
+def load_pegasus_model(path):
+    from transformers import PegasusForConditionalGeneration
+    model = PegasusForConditionalGeneration.from_pretrained(path, local_files_only=True)
+    model.eval()
+    return model
+
+def load_pegasus_tokenizer(path):
+    from transformers import PegasusTokenizer
+    return PegasusTokenizer.from_pretrained(path, local_files_only=True)
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations quantized on the fly)."""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_pegasus_int8_model(path):
+    """
+    Load the int8 variant published under <path>/int8. Falls back to the fp32
+    checkpoint if no variant has passed the accuracy gate yet.
+    """
+    import torch
+    from transformers import PegasusConfig, PegasusForConditionalGeneration
+
+    weights = os.path.join(path, INT8_SUBDIR, INT8_WEIGHTS)
+    if not os.path.isfile(weights):
+        print(f"⚠️ No published int8 variant in {os.path.dirname(weights)}, serving fp32")
+        return load_pegasus_model(path)
+    config = PegasusConfig.from_pretrained(path, local_files_only=True)
+    model = quantize_int8(PegasusForConditionalGeneration(config).eval())
+    model.load_state_dict(torch.load(weights, map_location="cpu"))
+    model.eval()
+    return model
+
+def select_model_loader(backend=INFERENCE_BACKEND, precision=MODEL_PRECISION):
+    """Model loader for the configured inference backend and precision."""
+    if precision not in ("fp32", "int8"):
+        raise ValueError(f"Unknown model precision: {precision}")
+    if backend == "torch":
+        return load_pegasus_int8_model if precision == "int8" else load_pegasus_model
+    if precision == "int8":
+        raise ValueError("int8 precision is only available for the torch backend")
+    if backend == "onnx":
+        from onnx_engine import load_onnx_model
+        return load_onnx_model
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+# ------------------- REGISTRY -------------------
+class ModelRegistry:
+    """
+    Loads models on first use, shares tokenizer instances between models that
+    point at the same tokenizer directory, and can unload idle models.
+    Loading runs under a per-model lock, not the registry lock, so a slow
+    load does not block revision() lookups or requests for other models.
+    """
+
+    def __init__(self, idle_timeout=MODEL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._specs = {}
+        self._models = {}
+        self._tokenizers = {}
+        self._last_used = {}
+        self._revisions = {}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._reaper = None
+
+    def register(self, name, model_path, tokenizer_path=None, backend=INFERENCE_BACKEND,
+                 precision=MODEL_PRECISION, model_loader=None, tokenizer_loader=load_pegasus_tokenizer):
+        """Describe a model without loading it."""
+        with self._lock:
+            self._specs[name] = {
+                "model_path": model_path,
+                "backend": backend,
+                "precision": precision,
+                "model_loader": model_loader or select_model_loader(backend, precision),
+                "tokenizer_path": tokenizer_path or SHARED_TOKENIZER_PATH or model_path,
+                "tokenizer_loader": tokenizer_loader,
+            }
+
+    def is_registered(self, name):
+        return name in self._specs
+
+    def _spec(self, name):
+        if name not in self._specs:
+            raise KeyError(f"Model '{name}' is not registered")
+        return self._specs[name]
+
+    def _load_lock(self, key):
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def get_tokenizer(self, name):
+        spec = self._spec(name)
+        path = spec["tokenizer_path"]
+        tokenizer = self._tokenizers.get(path)
+        if tokenizer is not None:
+            return tokenizer
+        with self._load_lock(("tokenizer", path)):
+            if path not in self._tokenizers:
+                tokenizer = spec["tokenizer_loader"](path)
+                with self._lock:
+                    self._tokenizers[path] = tokenizer
+            return self._tokenizers[path]
+
+    def get_model(self, name):
+        """Return the model, loading it on first use."""
+        model = self._models.get(name)
+        if model is None:
+            model = self.load(name)
+        with self._lock:
+            self._last_used[name] = time.monotonic()
+        return model
+
+    def load(self, name):
+        spec = self._spec(name)
+        with self._load_lock(("model", name)):
+            model = self._models.get(name)
+            if model is None:
+                print(f"🔹 Loading model '{name}' from {spec['model_path']}...")
+                model = spec["model_loader"](spec["model_path"])
+                with self._lock:
+                    self._models[name] = model
+                    self._last_used[name] = time.monotonic()
+                    self._start_reaper()
+            return model
+
+    def unload(self, name):
+        """Drop the model (and its tokenizer if no other loaded model uses it)."""
+        with self._lock:
+            model = self._models.pop(name, None)
+            self._last_used.pop(name, None)
+            path = self._spec(name)["tokenizer_path"]
+            still_used = any(self._specs[other]["tokenizer_path"] == path for other in self._models)
+            if not still_used:
+                self._tokenizers.pop(path, None)
+        return model is not None
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def loaded_models(self):
+        return list(self._models)
+
+    def revision(self, name):
+        """Checkpoint revision used in cache keys; computed without loading."""
+        with self._lock:
+            if name not in self._revisions:
+                spec = self._spec(name)
+                revision = directory_revision(spec["model_path"])
+                if spec["precision"] == "int8":
+                    revision = directory_revision(os.path.join(spec["model_path"], INT8_SUBDIR))
+                self._revisions[name] = f"{revision}:{spec['backend']}:{spec['precision']}"
+            return self._revisions[name]
+
+    def memory_footprint(self, name=None):
+        """Bytes held by parameters and buffers of one or all loaded models."""
+        names = [name] if name is not None else list(self._models)
+        total = 0
+        for model_name in names:
+            model = self._models.get(model_name)
+            if model is None:
+                continue
+            if hasattr(model, "parameters"):
+                tensors = list(model.parameters()) + list(model.buffers())
+                total += sum(t.numel() * t.element_size() for t in tensors)
+                # Dynamically quantized Linear layers keep packed int8 weights outside parameters()
+                for module in model.modules():
+                    if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+                        weight = module.weight()
+                        total += weight.numel() * weight.element_size()
+            elif hasattr(model, "model_save_dir"):
+                # ONNX Runtime sessions: approximate with the size of the graphs on disk
+                save_dir = str(model.model_save_dir)
+                total += sum(
+                    os.path.getsize(os.path.join(save_dir, f))
+                    for f in os.listdir(save_dir) if ".onnx" in f
+                )
+        return total
+
+    def evict_idle(self, max_idle_seconds=None):
+        """Unload every model unused for max_idle_seconds; returns the evicted names."""
+        max_idle = self.idle_timeout if max_idle_seconds is None else max_idle_seconds
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, used in self._last_used.items() if now - used >= max_idle]
+            for name in idle:
+                self.unload(name)
+        if idle:
+            import gc
+            gc.collect()
+        return idle
+
+    def _start_reaper(self):
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(1.0, self.idle_timeout / 4))
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+registry = ModelRegistry()
+registry.register("summarizer", SUMMARIZATION_MODEL_PATH)
+registry.register("paraphraser", PARAPHRASE_MODEL_PATH)
+# Assisted generation runs the draft alongside the torch model, so drafts are always torch fp32
+if SUMMARIZATION_DRAFT_MODEL_PATH:
+    registry.register("summarizer-draft", SUMMARIZATION_DRAFT_MODEL_PATH, backend="torch", precision="fp32")
+if PARAPHRASE_DRAFT_MODEL_PATH:
+    registry.register("paraphraser-draft", PARAPHRASE_DRAFT_MODEL_PATH, backend="torch", precision="fp32")
@@ -1,5 +1,15 @@
+from typing import List
 from typing_extensions import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+# Request bounds for the inference endpoints; anything larger would be
+# admitted on an idle server and could exhaust memory in one generate call.
+# Longer documents go through /jobs.
+MAX_TEXT_CHARS = 50000
+MAX_JOB_TEXT_CHARS = 2000000
+MAX_GENERATE_LENGTH = 512
+MAX_NUM_BEAMS = 8
+MAX_CANDIDATES = 16
 
 class UserCreate(BaseModel):
     username:str
@@ -24,3 +34,56 @@ class UpdatePasswordRequest(BaseModel):
     email: EmailStr
     new_password: str
 
+
+class SummarizeRequest(BaseModel):
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    level: str = "Easy"
+    do_sample: bool = False
+    temperature: Optional[float] = Field(default=None, gt=0, le=5)
+    top_p: Optional[float] = Field(default=None, gt=0, le=1)
+
+class ParaphraseRequest(BaseModel):
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    max_length: int = Field(default=100, ge=1, le=MAX_GENERATE_LENGTH)
+    do_sample: bool = False
+    temperature: Optional[float] = Field(default=None, gt=0, le=5)
+    top_p: Optional[float] = Field(default=None, gt=0, le=1)
+
+class SummarizeLevelsRequest(BaseModel):
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    levels: List[str] = Field(default=["Easy"], min_length=1, max_length=3)
+    # Optional latency budget in seconds; decoding is narrowed to fit it
+    deadline: Optional[float] = Field(default=None, gt=0, le=600)
+
+class ParaphraseTextRequest(BaseModel):
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    max_length: int = Field(default=100, ge=1, le=MAX_GENERATE_LENGTH)
+    num_beams: int = Field(default=5, ge=1, le=MAX_NUM_BEAMS)
+
+class ParaphraseCandidatesRequest(BaseModel):
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    num_candidates: int = Field(default=4, ge=1, le=MAX_CANDIDATES)
+    max_length: int = Field(default=100, ge=1, le=MAX_GENERATE_LENGTH)
+    num_beams: Optional[int] = Field(default=None, ge=1, le=MAX_CANDIDATES)
+    do_sample: bool = False
+    temperature: Optional[float] = Field(default=None, gt=0, le=5)
+    top_p: Optional[float] = Field(default=None, gt=0, le=1)
+    ranked: bool = True
+
+class JobSubmitRequest(BaseModel):
+    text: str = Field(max_length=MAX_JOB_TEXT_CHARS)
+    kind: str = "summarize"
+    level: str = "Easy"
+    max_length: int = Field(default=100, ge=1, le=MAX_GENERATE_LENGTH)
+    priority: int = 0
+
+class BatchItem(BaseModel):
+    id: str
+    task: str = "summarize"
+    text: str = Field(max_length=MAX_TEXT_CHARS)
+    level: str = "Easy"
+    max_length: int = Field(default=100, ge=1, le=MAX_GENERATE_LENGTH)
+    num_beams: int = Field(default=5, ge=1, le=MAX_NUM_BEAMS)
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
@@ -0,0 +1,126 @@
+import os
+import sys
+import argparse
+
+# --------------------------- CONFIG ---------------------------
+# Exported models are written next to each other under this directory,
+# one sub-directory per checkpoint
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", os.path.join(os.path.dirname(__file__), "onnx_models"))
+ONNX_PROVIDER = os.getenv("ONNX_PROVIDER", "CPUExecutionProvider")
+ONNX_FILES = ("encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx")
+
+def _ort_model_class():
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError(
+            "The ONNX backend needs optimum with onnxruntime: pip install 'optimum[onnxruntime]'"
+        ) from e
+    return ORTModelForSeq2SeqLM
+
+# --------------------------- EXPORT ---------------------------
+def is_exported(onnx_dir):
+    return all(os.path.isfile(os.path.join(onnx_dir, name)) for name in ONNX_FILES)
+
+def export_dir_for(model_path):
+    name = os.path.basename(os.path.normpath(model_path))
+    return os.path.join(ONNX_EXPORT_DIR, name)
+
+def export_onnx(model_path, output_dir=None):
+    """
+    Export a Pegasus checkpoint to ONNX as encoder, decoder and
+    decoder-with-past graphs (the latter reuses the KV cache between steps).
+    """
+    from transformers import PegasusTokenizer
+
+    output_dir = output_dir or export_dir_for(model_path)
+    print(f"🔹 Exporting {model_path} to ONNX in {output_dir}...")
+    ort_model = _ort_model_class().from_pretrained(model_path, export=True, use_cache=True, local_files_only=True)
+    ort_model.save_pretrained(output_dir)
+    PegasusTokenizer.from_pretrained(model_path, local_files_only=True).save_pretrained(output_dir)
+    return output_dir
+
+# --------------------------- LOAD ---------------------------
+def load_onnx_model(model_path):
+    """
+    Model loader for the registry: returns an ONNX Runtime seq2seq model with
+    the same generate() interface as the torch model. The checkpoint is
+    exported on first use if no export exists yet.
+    """
+    onnx_dir = model_path if is_exported(model_path) else export_dir_for(model_path)
+    if not is_exported(onnx_dir):
+        export_onnx(model_path, onnx_dir)
+    return _ort_model_class().from_pretrained(onnx_dir, use_cache=True, provider=ONNX_PROVIDER)
+
+# --------------------------- PARITY CHECK ---------------------------
+def check_parity(model_path, texts, max_length=60, num_beams=4, atol=1e-3):
+    """
+    Compare the ONNX Runtime model against the torch model: maximum absolute
+    logit difference on one teacher-forced forward pass per text, and the
+    share of texts whose generated output is identical.
+    """
+    import torch
+    from model_registry import load_pegasus_model, load_pegasus_tokenizer
+
+    tokenizer = load_pegasus_tokenizer(model_path)
+    torch_model = load_pegasus_model(model_path)
+    ort_model = load_onnx_model(model_path)
+
+    max_diff = 0.0
+    matches = 0
+    for text in texts:
+        inputs = tokenizer([text], truncation=True, return_tensors="pt")
+        with torch.no_grad():
+            torch_ids = torch_model.generate(**inputs, max_length=max_length, num_beams=num_beams, early_stopping=True)
+            torch_logits = torch_model(**inputs, decoder_input_ids=torch_ids).logits
+        ort_ids = ort_model.generate(**inputs, max_length=max_length, num_beams=num_beams, early_stopping=True)
+        ort_logits = ort_model(**inputs, decoder_input_ids=torch_ids).logits
+
+        max_diff = max(max_diff, (torch_logits - ort_logits).abs().max().item())
+        torch_text = tokenizer.decode(torch_ids[0], skip_special_tokens=True)
+        ort_text = tokenizer.decode(ort_ids[0], skip_special_tokens=True)
+        matches += torch_text == ort_text
+
+    return {
+        "samples": len(texts),
+        "max_logit_diff": max_diff,
+        "exact_match_rate": matches / len(texts) if texts else 1.0,
+        "within_tolerance": max_diff <= atol,
+    }
+
+def read_samples(csv_path, column="dialogue_clean", limit=20):
+    import csv
+    texts = []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get(column):
+                texts.append(row[column])
+            if len(texts) >= limit:
+                break
+    return texts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Pegasus checkpoints to ONNX and check parity with torch")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="export a checkpoint to ONNX")
+    export_cmd.add_argument("model_path")
+    export_cmd.add_argument("--output-dir")
+
+    parity_cmd = commands.add_parser("parity", help="compare ONNX Runtime outputs with torch")
+    parity_cmd.add_argument("model_path")
+    parity_cmd.add_argument("--samples", default="data/test_clean.csv")
+    parity_cmd.add_argument("--limit", type=int, default=20)
+    parity_cmd.add_argument("--atol", type=float, default=1e-3)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_onnx(args.model_path, args.output_dir)
+        return 0
+
+    result = check_parity(args.model_path, read_samples(args.samples, limit=args.limit), atol=args.atol)
+    print(result)
+    return 0 if result["within_tolerance"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import numpy as np
+from extractive import WORD
+
+# --------------------------- FEATURES ---------------------------
+def ngram_counts(texts, n):
+    """Count matrix of word n-grams, one row per text, over a shared vocabulary."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        words = WORD.findall(text.lower())
+        for start in range(len(words) - n + 1):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(tuple(words[start:start + n]), len(vocabulary)))
+
+    counts = np.zeros((len(texts), max(1, len(vocabulary))), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0)
+    return counts
+
+def cosine_to_first(counts):
+    """Cosine similarity of every row after the first to the first row."""
+    norms = np.linalg.norm(counts, axis=1)
+    norms = np.where(norms == 0, 1.0, norms)
+    return (counts[1:] @ counts[0]) / (norms[1:] * norms[0])
+
+# --------------------------- SCORING ---------------------------
+def score_candidates(source, candidates, overlap_weight=0.6, novelty_weight=0.4):
+    """
+    Score all candidates against the source at once; the score is the
+    weighted harmonic mean of overlap and novelty.
+    overlap: unigram cosine similarity to the source (meaning kept).
+    novelty: share of the candidate's bigrams not found in the source
+    (rewording rather than copying).
+    diversity: mean unigram distance to the other candidates.
+    Returns one dict per candidate, in input order.
+    """
+    texts = [source] + list(candidates)
+    unigrams = ngram_counts(texts, 1)
+    bigrams = ngram_counts(texts, 2)
+
+    overlap = cosine_to_first(unigrams)
+    copied = np.minimum(bigrams[1:], bigrams[0]).sum(axis=1)
+    totals = bigrams[1:].sum(axis=1)
+    novelty = np.where(totals > 0, 1.0 - copied / np.where(totals == 0, 1.0, totals), 0.0)
+
+    norms = np.linalg.norm(unigrams[1:], axis=1, keepdims=True)
+    vectors = unigrams[1:] / np.where(norms == 0, 1.0, norms)
+    if len(candidates) > 1:
+        distance = 1.0 - vectors @ vectors.T
+        np.fill_diagonal(distance, 0.0)
+        diversity = distance.sum(axis=1) / (len(candidates) - 1)
+    else:
+        diversity = np.zeros(len(candidates), dtype=np.float32)
+
+    # Weighted harmonic mean: verbatim copies (no novelty) and unrelated
+    # text (no overlap) both score zero
+    both = (overlap > 0) & (novelty > 0)
+    scores = np.where(
+        both,
+        (overlap_weight + novelty_weight) / (overlap_weight / np.where(both, overlap, 1.0) +
+                                             novelty_weight / np.where(both, novelty, 1.0)),
+        0.0
+    )
+    return [
+        {
+            "text": candidate,
+            "score": round(float(scores[i]), 4),
+            "overlap": round(float(overlap[i]), 4),
+            "novelty": round(float(novelty[i]), 4),
+            "diversity": round(float(diversity[i]), 4),
+        }
+        for i, candidate in enumerate(candidates)
+    ]
+
+def rank_candidates(source, candidates, overlap_weight=0.6, novelty_weight=0.4):
+    """Unique candidates with their scores, best first."""
+    unique = list(dict.fromkeys(candidate.strip() for candidate in candidates if candidate.strip()))
+    if not unique:
+        return []
+    scored = score_candidates(source, unique, overlap_weight, novelty_weight)
+    return sorted(scored, key=lambda entry: entry["score"], reverse=True)
@@ -1,35 +1,278 @@
 import os
-from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+import re
+import time
+from result_cache import cached_result, make_cache_key, TinyLFUCache
+from model_registry import registry, generate_slots
+from streaming import stream_generate, sampling_kwargs
+from documents import pad_id_batch, split_sentences
+from bucketing import run_bucketed, get_padding_stats
+from paraphrase_ranking import rank_candidates
 
 # --------------------- CONFIG ---------------------
-model_path = r"C:\Users\varsh\OneDrive\Desktop\clonedproject\Text-morph---Advanced-Summarization-Using-AI\pegasus-paraphraser"
+# The checkpoint path comes from PARAPHRASE_MODEL_PATH; the registry loads the
+# model the first time a paraphrase is requested.
+MODEL_NAME = "paraphraser"
 
-# model_path = "./pegasus-paraphraser"
+def get_tokenizer():
+    return registry.get_tokenizer(MODEL_NAME)
 
-print(f"🔹 Loading paraphraser model from {model_path}...")
-tokenizer = PegasusTokenizer.from_pretrained(model_path, local_files_only=True)
-model = PegasusForConditionalGeneration.from_pretrained(model_path, local_files_only=True)
+def get_model():
+    return registry.get_model(MODEL_NAME)
+
+# Small draft model proposing tokens for speculative (assisted) decoding
+DRAFT_MODEL_NAME = "paraphraser-draft"
+PARAPHRASE_USE_DRAFT = os.getenv("PARAPHRASE_USE_DRAFT", "0") == "1"
+
+def get_draft_model():
+    """The draft model, or None when PARAPHRASE_DRAFT_MODEL_PATH is not set."""
+    if not registry.is_registered(DRAFT_MODEL_NAME):
+        return None
+    return registry.get_model(DRAFT_MODEL_NAME)
+
+PARAPHRASE_BATCH_SIZE = int(os.getenv("PARAPHRASE_BATCH_SIZE", "8"))
+# Weights of source overlap vs. rewording when ranking candidate paraphrases
+PARAPHRASE_OVERLAP_WEIGHT = float(os.getenv("PARAPHRASE_OVERLAP_WEIGHT", "0.6"))
+PARAPHRASE_NOVELTY_WEIGHT = float(os.getenv("PARAPHRASE_NOVELTY_WEIGHT", "0.4"))
 
 # --------------------- FUNCTIONS ---------------------
-def generate_paraphrase(text, max_length=100, num_beams=5):
-    """Generate a paraphrased version of text"""
+@cached_result("paraphrase", lambda: registry.revision(MODEL_NAME))
+def generate_paraphrase(text, max_length=100, num_beams=5, use_draft=PARAPHRASE_USE_DRAFT):
+    """Generate a paraphrased version of text (greedy + draft model when use_draft is set)"""
+    tokenizer, model = get_tokenizer(), get_model()
+    inputs = tokenizer([text], truncation=True, padding="longest", return_tensors="pt")
+    draft = get_draft_model() if use_draft else None
+    generate_kwargs = dict(max_length=max_length, num_beams=num_beams, early_stopping=True)
+    if draft is not None:
+        # Assisted generation only supports greedy search
+        generate_kwargs.update(num_beams=1, assistant_model=draft)
+    with generate_slots:
+        outputs = model.generate(inputs.input_ids, **generate_kwargs)
+    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+
+def generate_paraphrase_batch(texts, max_length=100, num_beams=5, batch_size=PARAPHRASE_BATCH_SIZE,
+                              max_input_tokens=None, on_batch=None):
+    """
+    Paraphrase several texts in length-bucketed padded batches, keeping input
+    order. on_batch is passed to run_bucketed.
+    """
+    tokenizer, model = get_tokenizer(), get_model()
+    id_lists = tokenizer(list(texts), truncation=True, max_length=max_input_tokens)["input_ids"]
+
+    def paraphrase_batch(batch):
+        input_ids, attention_mask = pad_id_batch(batch, tokenizer.pad_token_id)
+        with generate_slots:
+            outputs = model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                max_length=max_length,
+                num_beams=num_beams,
+                early_stopping=True
+            )
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    return run_bucketed(
+        id_lists,
+        [len(ids) for ids in id_lists],
+        paraphrase_batch,
+        batch_size,
+        stats=get_padding_stats(MODEL_NAME),
+        on_batch=on_batch
+    )
+
+
+def generate_paraphrase_candidates(text, num_candidates=4, max_length=100, num_beams=None,
+                                   do_sample=False, temperature=None, top_p=None):
+    """
+    Generate num_candidates paraphrases in one generate call (beam search, or
+    sampling when do_sample is set) and rank them against the source text.
+    Returns a list of {"text", "score", "overlap", "novelty", "diversity"},
+    best first, with duplicate candidates removed.
+    """
+    tokenizer, model = get_tokenizer(), get_model()
+    inputs = tokenizer([text], truncation=True, return_tensors="pt")
+    if do_sample:
+        generate_kwargs = sampling_kwargs(True, temperature, top_p)
+    else:
+        generate_kwargs = dict(num_beams=max(num_beams or 5, num_candidates), early_stopping=True)
+    with generate_slots:
+        outputs = model.generate(
+            inputs.input_ids,
+            attention_mask=inputs.attention_mask,
+            max_length=max_length,
+            num_return_sequences=num_candidates,
+            **generate_kwargs
+        )
+    candidates = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    return rank_candidates(text, candidates, PARAPHRASE_OVERLAP_WEIGHT, PARAPHRASE_NOVELTY_WEIGHT)
+
+
+def generate_best_paraphrase(text, num_candidates=4, **kwargs):
+    """The top-ranked of num_candidates paraphrases generated in one pass"""
+    ranked = generate_paraphrase_candidates(text, num_candidates=num_candidates, **kwargs)
+    return ranked[0]["text"] if ranked else ""
+
+
+def stream_paraphrase(text, max_length=100, do_sample=False, temperature=None, top_p=None):
+    """Yield a paraphrase piece by piece as tokens are decoded (greedy or sampling)"""
+    tokenizer, model = get_tokenizer(), get_model()
     inputs = tokenizer([text], truncation=True, padding="longest", return_tensors="pt")
-    outputs = model.generate(
+    yield from stream_generate(
+        model,
+        tokenizer,
         inputs.input_ids,
+        inputs.attention_mask,
         max_length=max_length,
-        num_beams=num_beams,
-        early_stopping=True
+        **sampling_kwargs(do_sample, temperature, top_p)
     )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
 
 
-def paraphrase_long_text(text, chunk_size=512, **kwargs):
-    """Paraphrase long text by splitting into chunks"""
-    tokens = tokenizer.tokenize(text)
-    paraphrased_chunks = []
+# --------------------- SENTENCE MEMO ---------------------
+# Boilerplate sentences (greetings, disclaimers, headers) recur across
+# documents; their paraphrases are kept in a frequency-aware cache.
+PARAPHRASE_SENTENCE_CACHE_SIZE = int(os.getenv("PARAPHRASE_SENTENCE_CACHE_SIZE", "20000"))
+_sentence_cache = None
 
-    for i in range(0, len(tokens), chunk_size):
-        chunk = tokenizer.convert_tokens_to_string(tokens[i:i+chunk_size])
-        paraphrased_chunks.append(generate_paraphrase(chunk, **kwargs))
+def get_sentence_cache():
+    global _sentence_cache
+    if _sentence_cache is None:
+        _sentence_cache = TinyLFUCache(PARAPHRASE_SENTENCE_CACHE_SIZE)
+    return _sentence_cache
 
-    return " ".join(paraphrased_chunks)
+def paraphrase_sentences(sentences, max_length=100, num_beams=5, batch_size=PARAPHRASE_BATCH_SIZE,
+                         max_input_tokens=None, on_batch=None):
+    """
+    Paraphrase sentences through the sentence memo: each distinct normalized
+    sentence missing from the memo goes through generate_paraphrase_batch
+    once (on_batch is called after each of its batches), everything else is
+    served from the memo. Keeps input order.
+    """
+    cache = get_sentence_cache()
+    params = {"max_length": max_length, "num_beams": num_beams, "max_input_tokens": max_input_tokens}
+    revision = registry.revision(MODEL_NAME)
+    keys = [make_cache_key("paraphrase-sentence", sentence, params, revision) for sentence in sentences]
+    results = [cache.get(key) for key in keys]
+
+    pending = {}
+    for index, result in enumerate(results):
+        if result is None:
+            pending.setdefault(keys[index], sentences[index])
+    if pending:
+        outputs = generate_paraphrase_batch(
+            list(pending.values()),
+            max_length=max_length,
+            num_beams=num_beams,
+            batch_size=batch_size,
+            max_input_tokens=max_input_tokens,
+            on_batch=on_batch
+        )
+        fresh = dict(zip(pending, outputs))
+        for key, output in fresh.items():
+            cache.put(key, output)
+        results = [fresh[key] if result is None else result for key, result in zip(keys, results)]
+    return results
+
+# --------------------- LONG TEXT ---------------------
+# All sentences of a long text go through one paraphrase_sentences call, so
+# length bucketing sees the whole document and padding stays minimal.
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Sentences shorter than this many words are paraphrased together with a
+# neighbour, so list items, headings and stray fragments keep their context
+PARAPHRASE_MIN_SENTENCE_WORDS = int(os.getenv("PARAPHRASE_MIN_SENTENCE_WORDS", "4"))
+SENTENCE_ENDING = re.compile(r"([.!?]+)([\"'\u201d\u2019)\]]*)$")
+CLOSER_OPENERS = {'"': '"', "'": "'", "\u201d": "\u201c", "\u2019": "\u2018", ")": "(", "]": "["}
+
+def merge_short_sentences(sentences, min_words=PARAPHRASE_MIN_SENTENCE_WORDS):
+    """Join sentences under min_words onto the previous one (the first onto the next)."""
+    merged = []
+    for sentence in sentences:
+        if merged and (len(sentence.split()) < min_words or len(merged[-1].split()) < min_words):
+            merged[-1] = f"{merged[-1]} {sentence}"
+        else:
+            merged.append(sentence)
+    return merged
+
+def keep_sentence_ending(source, paraphrase):
+    """
+    Give a paraphrase the source's end punctuation if generation dropped it,
+    plus any closing quote/bracket whose opener the paraphrase still has.
+    """
+    paraphrase = paraphrase.strip()
+    ending = SENTENCE_ENDING.search(source)
+    if not ending or not paraphrase or SENTENCE_ENDING.search(paraphrase):
+        return paraphrase
+    closers = "".join(
+        closer for closer in ending.group(2)
+        if paraphrase.count(CLOSER_OPENERS[closer]) > paraphrase.count(closer) or
+        (CLOSER_OPENERS[closer] == closer and paraphrase.count(closer) % 2)
+    )
+    return paraphrase + ending.group(1) + closers
+
+def paraphrase_long_text_with_report(text, chunk_size=512, max_length=100, num_beams=5,
+                                     batch_size=PARAPHRASE_BATCH_SIZE, progress=None):
+    """
+    Paraphrase long text sentence by sentence and return (paraphrase, report).
+    Very short sentences are merged into a neighbour first; all sentences
+    then go through paraphrase_sentences (memo, then length-bucketed
+    batches) and are reassembled paragraph by paragraph, each paraphrase
+    keeping its source sentence's end punctuation. chunk_size caps the input
+    tokens of a single sentence. The report lists per-batch sizes and
+    timings and the sentence memo hits/misses seen during the call.
+    progress, if given, is called as progress(sentences_done, total_sentences)
+    after every batch (it may raise to abort).
+    """
+    started = time.perf_counter()
+    paragraphs = [merge_short_sentences(split_sentences(paragraph)) for paragraph in PARAGRAPH_BREAK.split(text)]
+    paragraphs = [sentences for sentences in paragraphs if sentences]
+    sentences = [sentence for paragraph in paragraphs for sentence in paragraph]
+
+    cache = get_sentence_cache()
+    hits, misses = cache.hits, cache.misses
+    batches = []
+
+    def on_batch(lengths, seconds):
+        batches.append({
+            "sequences": len(lengths),
+            "max_tokens": max(lengths),
+            "seconds": round(seconds, 3),
+        })
+        if progress is not None:
+            progress(sum(batch["sequences"] for batch in batches), len(sentences))
+
+    if progress is not None:
+        progress(0, len(sentences))
+    outputs = paraphrase_sentences(
+        sentences,
+        max_length=max_length,
+        num_beams=num_beams,
+        batch_size=batch_size,
+        max_input_tokens=chunk_size,
+        on_batch=on_batch
+    )
+    if progress is not None:
+        progress(len(sentences), len(sentences))
+
+    paraphrased = iter(outputs)
+    paraphrase = "\n\n".join(
+        " ".join(keep_sentence_ending(sentence, next(paraphrased)) for sentence in paragraph)
+        for paragraph in paragraphs
+    )
+    report = {
+        "sentences": len(sentences),
+        "batches": batches,
+        "sentence_cache": {"hits": cache.hits - hits, "misses": cache.misses - misses},
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return paraphrase, report
+
+# Output keeps the paragraph and line structure, so the key must too
+@cached_result("paraphrase_long", lambda: registry.revision(MODEL_NAME), keep_lines=True)
+def paraphrase_long_text(text, chunk_size=512, max_length=100, num_beams=5, batch_size=PARAPHRASE_BATCH_SIZE):
+    """Paraphrase long text sentence by sentence (see paraphrase_long_text_with_report)"""
+    return paraphrase_long_text_with_report(
+        text,
+        chunk_size=chunk_size,
+        max_length=max_length,
+        num_beams=num_beams,
+        batch_size=batch_size
+    )[0]
@@ -0,0 +1,86 @@
+import os
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --------------------------- CONFIG ---------------------------
+# Cores given to each worker; the worker count is cores available / this value
+PROCESS_POOL_THREADS_PER_WORKER = int(os.getenv("PROCESS_POOL_THREADS_PER_WORKER", "4"))
+# Explicit worker count (0 derives it from the cores available)
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0"))
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def fork_supported():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+def core_slices(workers=PROCESS_POOL_WORKERS, threads_per_worker=PROCESS_POOL_THREADS_PER_WORKER):
+    """Split the available cores into one contiguous slice per worker."""
+    cores = available_cores()
+    if workers <= 0:
+        workers = max(1, len(cores) // max(1, threads_per_worker))
+    workers = min(workers, len(cores))
+    size = len(cores) // workers
+    return [cores[i * size:(i + 1) * size] for i in range(workers)]
+
+# --------------------------- WORKERS ---------------------------
+def _init_worker(slices, counter):
+    """Pin this worker to its core slice and size torch's thread pool to match."""
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    cores = slices[index % len(slices)]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    import torch
+    torch.set_num_threads(len(cores))
+
+class ForkedModelPool:
+    """
+    Process pool forked from a parent that has already loaded its models, so
+    every worker reads the same weight pages copy-on-write instead of loading
+    its own copy. Each worker is pinned to a disjoint slice of cores with a
+    matching intra-op thread count, which avoids the oversubscription of
+    running several torch-threaded generate calls from one process.
+    Tasks must be module-level functions so they can be sent by reference.
+
+    All workers are forked in the constructor and never replaced: a worker
+    that dies (e.g. out of memory) breaks the pool, and map() raises
+    BrokenProcessPool instead of re-forking from a parent that by then runs
+    other threads.
+    """
+
+    def __init__(self, workers=PROCESS_POOL_WORKERS, threads_per_worker=PROCESS_POOL_THREADS_PER_WORKER):
+        if not fork_supported():
+            raise RuntimeError("ForkedModelPool needs the 'fork' start method")
+        self.slices = core_slices(workers, threads_per_worker)
+        context = multiprocessing.get_context("fork")
+        # Keep already-loaded objects out of the collector so refcount/gc
+        # bookkeeping in the children touches as few shared pages as possible
+        gc.collect()
+        gc.freeze()
+        counter = context.Value("i", 0)
+        self._pool = ProcessPoolExecutor(
+            max_workers=len(self.slices),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.slices, counter)
+        )
+        # With fork, the first submit launches every worker at once
+        self._pool.submit(os.getpid).result()
+
+    @property
+    def workers(self):
+        return len(self.slices)
+
+    def map(self, fn, items):
+        """Run fn over items in the workers, preserving order; raises BrokenProcessPool if a worker died."""
+        return list(self._pool.map(fn, items))
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        gc.unfreeze()
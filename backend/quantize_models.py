@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from model_registry import (
+    SUMMARIZATION_MODEL_PATH,
+    PARAPHRASE_MODEL_PATH,
+    INT8_SUBDIR,
+    INT8_WEIGHTS,
+    load_pegasus_model,
+    load_pegasus_tokenizer,
+    quantize_int8,
+)
+
+# --------------------------- CONFIG ---------------------------
+# Largest acceptable ROUGE-L F1 drop (absolute) of the int8 variant versus fp32
+QUANTIZATION_MAX_ROUGE_DROP = float(os.getenv("QUANTIZATION_MAX_ROUGE_DROP", "0.01"))
+
+TASKS = {
+    "summarizer": {
+        "model_path": SUMMARIZATION_MODEL_PATH,
+        "generate": {"max_length": 70, "min_length": 30, "length_penalty": 1.5, "num_beams": 5, "early_stopping": True},
+    },
+    "paraphraser": {
+        "model_path": PARAPHRASE_MODEL_PATH,
+        "generate": {"max_length": 100, "num_beams": 5, "early_stopping": True},
+    },
+}
+
+# --------------------------- EVALUATION ---------------------------
+def read_test_rows(csv_path, limit):
+    import csv
+    rows = []
+    with open(csv_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("dialogue_clean") and row.get("summary_clean"):
+                rows.append(row)
+            if len(rows) >= limit:
+                break
+    return rows
+
+def run_model(model, tokenizer, texts, generate_kwargs):
+    """Generate outputs one text at a time; returns (outputs, mean seconds per text)."""
+    import torch
+    outputs = []
+    started = time.perf_counter()
+    for text in texts:
+        inputs = tokenizer([text], truncation=True, return_tensors="pt")
+        with torch.no_grad():
+            ids = model.generate(**inputs, **generate_kwargs)
+        outputs.append(tokenizer.decode(ids[0], skip_special_tokens=True))
+    return outputs, (time.perf_counter() - started) / max(1, len(texts))
+
+def mean_rouge(predictions, references):
+    from rouge_score import rouge_scorer
+    scorer = rouge_scorer.RougeScorer(["rouge1", "rouge2", "rougeL"], use_stemmer=True)
+    totals = {"rouge1": 0.0, "rouge2": 0.0, "rougeL": 0.0}
+    for prediction, reference in zip(predictions, references):
+        scores = scorer.score(reference, prediction)
+        for name in totals:
+            totals[name] += scores[name].fmeasure
+    return {name: value / max(1, len(predictions)) for name, value in totals.items()}
+
+def state_dict_size(model):
+    import torch
+    with tempfile.NamedTemporaryFile(suffix=".pt", delete=False) as f:
+        path = f.name
+    try:
+        torch.save(model.state_dict(), path)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+def evaluate_int8(task, model_path, data_path, limit):
+    """
+    Quantize the checkpoint and compare it with fp32 on data/test_clean.csv.
+    Summarizer: both are scored with ROUGE against the reference summaries.
+    Paraphraser: there is no paraphrase reference, so the fp32 outputs are the
+    reference and fp32 scores 1.0 by definition.
+    Returns (int8 model, report).
+    """
+    tokenizer = load_pegasus_tokenizer(model_path)
+    fp32_model = load_pegasus_model(model_path)
+    int8_model = quantize_int8(load_pegasus_model(model_path))
+    generate_kwargs = TASKS[task]["generate"]
+
+    rows = read_test_rows(data_path, limit)
+    texts = [row["dialogue_clean"] for row in rows]
+    fp32_outputs, fp32_latency = run_model(fp32_model, tokenizer, texts, generate_kwargs)
+    int8_outputs, int8_latency = run_model(int8_model, tokenizer, texts, generate_kwargs)
+
+    if task == "summarizer":
+        references = [row["summary_clean"] for row in rows]
+        fp32_rouge = mean_rouge(fp32_outputs, references)
+        int8_rouge = mean_rouge(int8_outputs, references)
+    else:
+        fp32_rouge = {"rouge1": 1.0, "rouge2": 1.0, "rougeL": 1.0}
+        int8_rouge = mean_rouge(int8_outputs, fp32_outputs)
+
+    fp32_size, int8_size = state_dict_size(fp32_model), state_dict_size(int8_model)
+    report = {
+        "task": task,
+        "model_path": model_path,
+        "samples": len(texts),
+        "rouge_fp32": fp32_rouge,
+        "rouge_int8": int8_rouge,
+        "rougeL_drop": fp32_rouge["rougeL"] - int8_rouge["rougeL"],
+        "size_bytes_fp32": fp32_size,
+        "size_bytes_int8": int8_size,
+        "size_ratio": int8_size / fp32_size,
+        "latency_s_fp32": fp32_latency,
+        "latency_s_int8": int8_latency,
+        "speedup": fp32_latency / int8_latency if int8_latency else None,
+    }
+    return int8_model, report
+
+# --------------------------- PUBLISH ---------------------------
+def publish(int8_model, model_path, report):
+    """Write the int8 weights, config and report to <model_path>/int8."""
+    import torch
+    output_dir = os.path.join(model_path, INT8_SUBDIR)
+    os.makedirs(output_dir, exist_ok=True)
+    torch.save(int8_model.state_dict(), os.path.join(output_dir, INT8_WEIGHTS))
+    shutil.copy(os.path.join(model_path, "config.json"), output_dir)
+    with open(os.path.join(output_dir, "quantization_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return output_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Produce int8 dynamically quantized model variants behind a ROUGE gate")
+    parser.add_argument("task", choices=sorted(TASKS))
+    parser.add_argument("--model-path", help="checkpoint directory (defaults to the configured path)")
+    parser.add_argument("--data", default="data/test_clean.csv")
+    parser.add_argument("--limit", type=int, default=100, help="number of test rows to evaluate")
+    parser.add_argument("--max-rouge-drop", type=float, default=QUANTIZATION_MAX_ROUGE_DROP)
+    parser.add_argument("--report", help="also write the report to this path")
+    args = parser.parse_args(argv)
+
+    model_path = args.model_path or TASKS[args.task]["model_path"]
+    int8_model, report = evaluate_int8(args.task, model_path, args.data, args.limit)
+    report["max_rouge_drop"] = args.max_rouge_drop
+    report["published"] = report["rougeL_drop"] <= args.max_rouge_drop
+
+    if report["published"]:
+        output_dir = publish(int8_model, model_path, report)
+        print(f"✅ int8 variant published to {output_dir}")
+    else:
+        print(f"❌ ROUGE-L drop {report['rougeL_drop']:.4f} exceeds {args.max_rouge_drop:.4f}; variant not published")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 0 if report["published"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import inspect
+import functools
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+import xxhash
+
+# --------------------------- CONFIG ---------------------------
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+# Path of a SQLite file for the persistent tier; empty keeps the cache in memory only
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "")
+# Bounds of the persistent tier: rows older than the TTL (0 disables it) and
+# the oldest rows over the cap are deleted. Rows keyed by an old model
+# revision are never hit again, so they age out the same way.
+RESULT_CACHE_DB_MAX_ROWS = int(os.getenv("RESULT_CACHE_DB_MAX_ROWS", "100000"))
+RESULT_CACHE_DB_TTL = float(os.getenv("RESULT_CACHE_DB_TTL", str(30 * 86400)))
+# The tier is pruned after this many writes
+RESULT_CACHE_PRUNE_EVERY = 256
+
+# --------------------------- KEYS ---------------------------
+def normalize_text(text, keep_lines=False):
+    """
+    Unicode-normalize and collapse whitespace so trivial edits share a key.
+    With keep_lines, line structure survives: only horizontal whitespace is
+    collapsed, and any run of two or more line breaks becomes one blank line.
+    """
+    text = unicodedata.normalize("NFC", str(text))
+    if not keep_lines:
+        return re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"[^\S\n]+", " ", text.replace("\r\n", "\n").replace("\r", "\n"))
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def make_cache_key(namespace, text, params, revision, keep_lines=False):
+    """Fast content hash of normalized text + generation params + model revision."""
+    h = xxhash.xxh3_128()
+    h.update(namespace.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(str(revision).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(normalize_text(text, keep_lines=keep_lines).encode("utf-8"))
+    return h.hexdigest()
+
+def make_ids_cache_key(namespace, ids, params, revision):
+    """Like make_cache_key, for content that is already a list of token ids."""
+    h = xxhash.xxh3_128()
+    h.update(namespace.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(str(revision).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    h.update(b"\x00")
+    h.update(array("i", ids).tobytes())
+    return h.hexdigest()
+
+def directory_revision(path):
+    """Revision string for a local checkpoint: path plus size/mtime of its files."""
+    h = xxhash.xxh64(str(path).encode("utf-8"))
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            if os.path.isfile(full):
+                st = os.stat(full)
+                h.update(f"{name}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return h.hexdigest()
+
+# --------------------------- CACHE ---------------------------
+_MISSING = object()
+
+class ResultCache:
+    """
+    Bounded in-memory LRU with an optional SQLite tier that survives restarts,
+    itself bounded by a row cap and a TTL. Values must be JSON-serializable.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, db_path=RESULT_CACHE_DB,
+                 db_max_rows=RESULT_CACHE_DB_MAX_ROWS, db_ttl=RESULT_CACHE_DB_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.db_path = db_path or None
+        self.db_max_rows = max(1, int(db_max_rows))
+        self.db_ttl = db_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._writes_since_prune = 0
+        if self.db_path:
+            self._init_db()
+            self._prune_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS result_cache_age ON result_cache (created_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _disk_get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value, created_at FROM result_cache WHERE key=?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or (self.db_ttl > 0 and row[1] < time.time() - self.db_ttl):
+            return _MISSING
+        return json.loads(row[0])
+
+    def _disk_put(self, key, value):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, created_at) VALUES (?,?,?)",
+                (key, json.dumps(value), time.time())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _prune_db(self):
+        """Delete expired rows, then the oldest rows over the cap; returns the number deleted."""
+        conn = self._connect()
+        try:
+            deleted = 0
+            if self.db_ttl > 0:
+                deleted += conn.execute(
+                    "DELETE FROM result_cache WHERE created_at < ?", (time.time() - self.db_ttl,)
+                ).rowcount
+            deleted += conn.execute(
+                "DELETE FROM result_cache WHERE key IN "
+                "(SELECT key FROM result_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.db_max_rows,)
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self.disk_evictions += deleted
+        return deleted
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.db_path:
+            try:
+                value = self._disk_get(key)
+            except sqlite3.Error as e:
+                print(f"Result cache read failed: {e}")
+                value = _MISSING
+            if value is not _MISSING:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.db_path:
+            with self._lock:
+                self._writes_since_prune += 1
+                prune = self._writes_since_prune >= RESULT_CACHE_PRUNE_EVERY
+                if prune:
+                    self._writes_since_prune = 0
+            try:
+                self._disk_put(key, value)
+                if prune:
+                    self._prune_db()
+            except sqlite3.Error as e:
+                print(f"Result cache write failed: {e}")
+
+    def clear(self):
+        """Drop every entry, in memory and in the SQLite tier."""
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM result_cache")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+_result_cache = None
+
+def get_result_cache():
+    """Process-wide cache shared by the summarizer and the paraphraser."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+# --------------------------- FREQUENCY-AWARE CACHE ---------------------------
+class FrequencySketch:
+    """
+    Count-min sketch of access frequencies with periodic aging: once the
+    number of recorded accesses reaches sample_size all counters are halved,
+    so old popularity fades.
+    """
+
+    def __init__(self, width, depth=4, sample_size=None):
+        self.width = max(16, int(width))
+        self.depth = depth
+        self.sample_size = sample_size or 10 * self.width
+        self._counts = [[0] * self.width for _ in range(depth)]
+        self._additions = 0
+
+    def _slots(self, key):
+        h = xxhash.xxh3_128_intdigest(str(key).encode("utf-8"))
+        return [((h >> (32 * row)) & 0xFFFFFFFF) % self.width for row in range(self.depth)]
+
+    def increment(self, key):
+        for row, slot in enumerate(self._slots(key)):
+            self._counts[row][slot] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._counts = [[count >> 1 for count in row] for row in self._counts]
+            self._additions //= 2
+
+    def estimate(self, key):
+        return min(self._counts[row][slot] for row, slot in enumerate(self._slots(key)))
+
+class TinyLFUCache:
+    """
+    In-memory cache with W-TinyLFU eviction. New entries land in a small LRU
+    window; an entry pushed out of the window only replaces the main area's
+    LRU victim if the sketch has seen it more often, so frequently repeated
+    keys stay resident while one-off keys pass through.
+    Same get/put/stats interface as ResultCache.
+    """
+
+    def __init__(self, max_entries, window_ratio=0.01):
+        self.max_entries = max(2, int(max_entries))
+        self.window_size = max(1, int(self.max_entries * window_ratio))
+        self.main_size = self.max_entries - self.window_size
+        self._window = OrderedDict()
+        self._main = OrderedDict()
+        self._sketch = FrequencySketch(self.max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            self._sketch.increment(key)
+            for area in (self._window, self._main):
+                if key in area:
+                    area.move_to_end(key)
+                    self.hits += 1
+                    return area[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._main:
+                self._main[key] = value
+                self._main.move_to_end(key)
+                return
+            self._window[key] = value
+            self._window.move_to_end(key)
+            if len(self._window) <= self.window_size:
+                return
+
+            candidate, candidate_value = self._window.popitem(last=False)
+            if len(self._main) < self.main_size:
+                self._main[candidate] = candidate_value
+                return
+            victim = next(iter(self._main))
+            if self._sketch.estimate(candidate) > self._sketch.estimate(victim):
+                del self._main[victim]
+                self._main[candidate] = candidate_value
+                self.evictions += 1
+            else:
+                self.rejections += 1
+
+    def clear(self):
+        with self._lock:
+            self._window.clear()
+            self._main.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._window) + len(self._main),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# --------------------------- DECORATOR ---------------------------
+def cached_result(namespace, revision, keep_lines=False):
+    """
+    Memoize fn(text, ...) on its normalized text, its bound arguments and the
+    model revision. revision may be a string or a zero-argument callable.
+    keep_lines keeps line and paragraph breaks in the key, for functions whose
+    output follows the input's layout.
+    The undecorated function stays reachable as wrapper.uncached.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            text = arguments.pop(next(iter(signature.parameters)))
+            rev = revision() if callable(revision) else revision
+            key = make_cache_key(namespace, text, arguments, rev, keep_lines=keep_lines)
+
+            cache = get_result_cache()
+            result = cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = fn(*args, **kwargs)
+                cache.put(key, result)
+            return result
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
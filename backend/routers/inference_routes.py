@@ -0,0 +1,323 @@
+import os
+import json
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from models import (
+    SummarizeRequest,
+    ParaphraseRequest,
+    SummarizeLevelsRequest,
+    ParaphraseTextRequest,
+    ParaphraseCandidatesRequest,
+    BatchRequest,
+)
+from summarization import stream_summary_by_level, summarize_levels, summarize_texts_by_level, get_level_params
+from paraphrasing import (
+    stream_paraphrase,
+    generate_paraphrase,
+    generate_paraphrase_batch,
+    generate_paraphrase_candidates,
+)
+from bucketing import padding_metrics
+from result_cache import get_result_cache
+from job_queue import get_job_queue
+from model_registry import GENERATE_CONCURRENCY
+from admission import get_admission_controller, estimate_work, AdmissionRejected, WorkTooLarge, INTERACTIVE, BULK
+
+router = APIRouter()
+
+# ------------------- INFERENCE EXECUTOR -------------------
+# Generation is CPU-bound; it runs on these threads so the event loop keeps
+# serving other requests (auth, profile, metrics) meanwhile.
+# Threads here mostly wait: single-level summaries queue in the micro-batcher
+# (SUMMARY_BATCH_MAX_SIZE per batch), so there must be at least that many to
+# fill a batch. Concurrent generate calls, from here and from the SSE
+# streams, are bounded separately by GENERATE_CONCURRENCY.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(2 * SUMMARY_BATCH_MAX_SIZE)))
+_inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+def submit_inference(fn, *args, ticket=None, **kwargs):
+    """
+    Start fn(*args, **kwargs) on the inference executor and return an
+    awaitable future. An admission ticket is released when the executor is
+    done with the call (or it is cancelled before starting), not when the
+    awaiting request gives up, so in-flight work is never under-counted.
+    """
+    future = _inference_executor.submit(functools.partial(fn, *args, **kwargs))
+    if ticket is not None:
+        future.add_done_callback(lambda _: get_admission_controller().release(ticket))
+    return asyncio.wrap_future(future)
+
+async def run_inference(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) running on the inference executor."""
+    return await submit_inference(fn, *args, **kwargs)
+
+@router.on_event("shutdown")
+def shutdown_inference_executor():
+    _inference_executor.shutdown(wait=False)
+
+# ------------------- ADMISSION CONTROL -------------------
+def admit(work, priority=INTERACTIVE, reserve=True):
+    """
+    Reserve token-work with the admission controller, or answer 429 with
+    Retry-After (413 if the request alone exceeds the limit). With
+    reserve=False only checks that the work would fit.
+    """
+    controller = get_admission_controller()
+    try:
+        if not reserve:
+            return controller.check(work, priority)
+        return controller.try_acquire(work, priority)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Inference capacity exceeded, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except WorkTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"{e}; shorten the text or lower max_length/num_beams")
+
+async def run_admitted(work, fn, *args, **kwargs):
+    """run_inference once work has been admitted; the work is released when fn returns."""
+    return await submit_inference(fn, *args, ticket=admit(work), **kwargs)
+
+def release_after(pieces, ticket):
+    """
+    Pass a stream through, releasing its admitted work once it ends or is
+    abandoned. Closing pieces first lets stream_generate stop and join its
+    generate thread, so the work is only released once generation stopped.
+    """
+    try:
+        yield from pieces
+    finally:
+        pieces.close()
+        get_admission_controller().release(ticket)
+
+def summary_work(text, levels):
+    work = 0
+    for level in levels:
+        params = get_level_params(level)
+        work += estimate_work(text, params["max_length"], params["num_beams"])
+    return work
+
+def item_work(item):
+    if item.task == "summarize":
+        return summary_work(item.text, [item.level])
+    return estimate_work(item.text, item.max_length, item.num_beams)
+
+# ------------------- SUMMARIZE / PARAPHRASE -------------------
+@router.post("/summarize")
+async def summarize(request: SummarizeLevelsRequest):
+    work = summary_work(request.text, request.levels)
+    if len(request.levels) == 1:
+        # One level (what the dashboard sends): the micro-batcher merges it
+        # with concurrent requests for the same level
+        level = request.levels[0]
+        summary = await run_admitted(work, summarize_text_by_level, request.text, level, deadline=request.deadline)
+        return {"summaries": {level: summary}}
+    # Several levels share one encoder pass
+    summaries = await run_admitted(
+        work,
+        summarize_levels,
+        request.text,
+        levels=tuple(request.levels),
+        deadline=request.deadline
+    )
+    return {"summaries": summaries}
+
+@router.post("/paraphrase")
+async def paraphrase(request: ParaphraseTextRequest):
+    paraphrased = await run_admitted(
+        estimate_work(request.text, request.max_length, request.num_beams),
+        generate_paraphrase,
+        request.text,
+        max_length=request.max_length,
+        num_beams=request.num_beams
+    )
+    return {"paraphrase": paraphrased}
+
+# ------------------- BATCH (NDJSON) -------------------
+# Items sharing a task and parameters are sorted by length and run in slices
+# (at most BATCH_SLICE_SIZE items, sized to fit the bulk admission limit) on
+# the inference executor; each finished slice is streamed back immediately,
+# one JSON line per item.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_SLICE_SIZE = int(os.getenv("BATCH_SLICE_SIZE", "16"))
+
+BATCH_TASKS = {
+    "summarize": (lambda item: (item.level,),
+                  lambda texts, level: summarize_texts_by_level(texts, level=level)),
+    "paraphrase": (lambda item: (item.max_length, item.num_beams),
+                   lambda texts, max_length, num_beams: generate_paraphrase_batch(
+                       texts, max_length=max_length, num_beams=num_beams)),
+}
+
+def batch_slices(items, slice_size=BATCH_SLICE_SIZE, work_budget=None):
+    """
+    Group items by (task, params) and cut each group, sorted by length, into
+    slices of at most slice_size items and work_budget token-work. The budget
+    defaults to an equal share of the bulk admission limit per generate
+    slot, so slices are admitted alongside other traffic instead of only
+    on an idle server. An item over the budget gets a slice of its own.
+    """
+    if work_budget is None:
+        work_budget = max(1, get_admission_controller().limits[BULK] // max(1, GENERATE_CONCURRENCY))
+    groups = {}
+    for item in items:
+        task_params, _ = BATCH_TASKS[item.task]
+        groups.setdefault((item.task, task_params(item)), []).append(item)
+    slices = []
+    for (task, params), members in groups.items():
+        members.sort(key=lambda item: len(item.text))
+        current, current_work = [], 0
+        for item in members:
+            work = item_work(item)
+            if current and (len(current) >= max(1, slice_size) or current_work + work > work_budget):
+                slices.append((task, params, current))
+                current, current_work = [], 0
+            current.append(item)
+            current_work += work
+        if current:
+            slices.append((task, params, current))
+    return slices
+
+async def batch_results(items, slices):
+    """
+    Yield NDJSON lines in completion order. Every slice is admitted as bulk
+    work before it runs; while the bulk share is used up the batch waits
+    (backpressure) instead of failing. Items with an unknown task or more
+    work than the bulk limit get an error line and are not run.
+    """
+    controller = get_admission_controller()
+    for item in items:
+        if item.task not in BATCH_TASKS:
+            yield json.dumps({"id": item.id, "error": f"Unknown task: {item.task}"}) + "\n"
+        elif controller.too_large(item_work(item), BULK):
+            yield json.dumps({"id": item.id, "task": item.task, "error": "Item exceeds the bulk work limit"}) + "\n"
+    slices = iter(slices)
+    next_slice = next(slices, None)
+
+    pending = {}
+    try:
+        while True:
+            # Keep only as many slices in flight as there are generate slots, so a
+            # large batch does not queue ahead of every other request
+            while next_slice is not None and len(pending) < GENERATE_CONCURRENCY:
+                task, params, members = next_slice
+                work = sum(item_work(item) for item in members)
+                ticket = controller.acquire_if_fits(work, BULK)
+                if ticket is None:
+                    if pending:
+                        break
+                    await asyncio.sleep(min(controller.retry_after(work, BULK), 1))
+                    continue
+                future = submit_inference(BATCH_TASKS[task][1], [item.text for item in members], *params, ticket=ticket)
+                pending[future] = (task, members)
+                next_slice = next(slices, None)
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                task, members = pending.pop(future)
+                try:
+                    outputs = future.result()
+                    lines = [{"id": item.id, "task": task, "result": output} for item, output in zip(members, outputs)]
+                except Exception as e:
+                    lines = [{"id": item.id, "task": task, "error": str(e)} for item in members]
+                yield "".join(json.dumps(line) + "\n" for line in lines)
+    finally:
+        # Client went away: drop slices that have not started; running ones
+        # release their work when the executor finishes them
+        for future in pending:
+            future.cancel()
+
+@router.post("/batch")
+async def batch(request: BatchRequest):
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    controller = get_admission_controller()
+    slices = batch_slices([
+        item for item in request.items
+        if item.task in BATCH_TASKS and not controller.too_large(item_work(item), BULK)
+    ])
+    if slices:
+        # Shed bulk work up front while the bulk share is exhausted
+        admit(sum(item_work(item) for item in slices[0][2]), BULK, reserve=False)
+    return StreamingResponse(batch_results(request.items, slices), media_type="application/x-ndjson")
+
+# ------------------- SERVER-SENT EVENTS -------------------
+def sse_events(pieces):
+    """Wrap text pieces as SSE 'data:' events, ending with a 'done' event."""
+    try:
+        for piece in pieces:
+            yield f"data: {json.dumps({'text': piece})}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        return
+    finally:
+        # Stop the underlying generation when the client disconnects
+        pieces.close()
+    yield "event: done\ndata: {}\n\n"
+
+def sse_response(pieces):
+    return StreamingResponse(
+        sse_events(pieces),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/summarize/stream")
+def summarize_stream(request: SummarizeRequest):
+    ticket = admit(estimate_work(request.text, get_level_params(request.level)["max_length"]))
+    return sse_response(release_after(stream_summary_by_level(
+        request.text,
+        level=request.level,
+        do_sample=request.do_sample,
+        temperature=request.temperature,
+        top_p=request.top_p
+    ), ticket))
+
+@router.post("/paraphrase/stream")
+def paraphrase_stream(request: ParaphraseRequest):
+    ticket = admit(estimate_work(request.text, request.max_length))
+    return sse_response(release_after(stream_paraphrase(
+        request.text,
+        max_length=request.max_length,
+        do_sample=request.do_sample,
+        temperature=request.temperature,
+        top_p=request.top_p
+    ), ticket))
+
+# ------------------- CANDIDATES -------------------
+@router.post("/paraphrase/candidates")
+async def paraphrase_candidates(request: ParaphraseCandidatesRequest):
+    """Candidates from one generation pass, ranked; ranked=False returns only the best."""
+    beams = request.num_candidates if request.do_sample else max(request.num_beams or 5, request.num_candidates)
+    candidates = await run_admitted(
+        estimate_work(request.text, request.max_length, beams),
+        generate_paraphrase_candidates,
+        request.text,
+        num_candidates=request.num_candidates,
+        max_length=request.max_length,
+        num_beams=request.num_beams,
+        do_sample=request.do_sample,
+        temperature=request.temperature,
+        top_p=request.top_p
+    )
+    if request.ranked:
+        return {"candidates": candidates}
+    return {"paraphrase": candidates[0]["text"] if candidates else ""}
+
+# ------------------- METRICS -------------------
+@router.get("/metrics")
+def inference_metrics():
+    return {
+        "padding": padding_metrics(),
+        "result_cache": get_result_cache().stats(),
+        # Long paraphrases (and their sentence memo) run in the job workers
+        "job_workers": get_job_queue().worker_stats(),
+        "admission": get_admission_controller().stats(),
+    }
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+from models import JobSubmitRequest
+from job_queue import get_job_queue, JOB_HANDLERS, DONE, FAILED, CANCELLED
+
+router = APIRouter()
+
+def job_status(job):
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "progress": {"done": job["progress_done"], "total": job["progress_total"]},
+        "cancel_requested": bool(job["cancel_requested"]),
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"],
+    }
+
+def find_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+# ------------------- JOBS -------------------
+@router.post("", status_code=202)
+def submit_job(request: JobSubmitRequest):
+    if request.kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {request.kind}")
+    payload = {"text": request.text, "level": request.level, "max_length": request.max_length}
+    job_id = get_job_queue().submit(request.kind, payload, priority=request.priority)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    return job_status(find_job(job_id))
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    """200 with the result when done, 202 while pending, 409 if failed or cancelled."""
+    job = find_job(job_id)
+    if job["status"] == DONE:
+        return {"job_id": job_id, "status": DONE, "result": job["result"]}
+    if job["status"] in (FAILED, CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Job {job['status']}: {job['error'] or ''}".strip())
+    return JSONResponse(status_code=202, content=job_status(job))
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str):
+    status = get_job_queue().cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return {"job_id": job_id, "status": status}
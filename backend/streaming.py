@@ -0,0 +1,62 @@
+import threading
+from model_registry import generate_slots
+
+# --------------------------- TOKEN STREAMING ---------------------------
+def stream_generate(model, tokenizer, input_ids, attention_mask, generate_fn=None, **generate_kwargs):
+    """
+    Run model.generate in a background thread and yield decoded text pieces as
+    tokens are produced. Streamers only work with one sequence, so callers
+    must use greedy or sampling decoding (num_beams=1).
+    If the consumer stops early (client disconnect), generation is stopped at
+    the next decoding step and the thread is joined before returning.
+    The thread holds one of the shared generate slots while it decodes.
+    generate_fn(model, input_ids, attention_mask, generate_kwargs), if given,
+    runs instead of the plain model.generate call and must take the slot
+    itself (summarization.run_generate does, and also feeds the cost model).
+    """
+    from transformers import TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
+
+    class StopWhenSet(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return cancelled.is_set()
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    cancelled = threading.Event()
+    stopping = StoppingCriteriaList(generate_kwargs.pop("stopping_criteria", None) or [])
+    stopping.append(StopWhenSet())
+    errors = []
+
+    def run():
+        kwargs = dict(generate_kwargs, streamer=streamer, stopping_criteria=stopping)
+        try:
+            if generate_fn is not None:
+                generate_fn(model, input_ids, attention_mask, kwargs)
+            else:
+                with generate_slots:
+                    model.generate(input_ids, attention_mask=attention_mask, **kwargs)
+        except Exception as e:
+            errors.append(e)
+            # Unblock the consumer waiting on the streamer queue
+            streamer.end()
+
+    worker = threading.Thread(target=run, name="generate-stream", daemon=True)
+    worker.start()
+    try:
+        for piece in streamer:
+            if piece:
+                yield piece
+    finally:
+        cancelled.set()
+        worker.join()
+    if errors:
+        raise errors[0]
+
+def sampling_kwargs(do_sample=False, temperature=None, top_p=None):
+    """Decoding arguments for a streamed (single-beam) generation."""
+    kwargs = dict(num_beams=1, do_sample=do_sample)
+    if do_sample:
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if top_p is not None:
+            kwargs["top_p"] = top_p
+    return kwargs
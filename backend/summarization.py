@@ -1,31 +1,95 @@
 import os
-from transformers import PegasusForConditionalGeneration, PegasusTokenizer
+import time
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
+from batch_scheduler import MicroBatchScheduler
+from result_cache import cached_result, make_cache_key, make_ids_cache_key, get_result_cache
+from model_registry import registry, generate_slots
+from documents import TokenizedDocument, pad_id_batch
+from streaming import stream_generate, sampling_kwargs
+from adaptive_decoding import DecodingCostModel
+from extractive import select_salient
+from process_pool import ForkedModelPool, BrokenProcessPool, fork_supported
+from bucketing import run_bucketed, get_padding_stats
 # --------------------------- SAVE PATH ---------------------------
 SAVE_PATH = "summarization_samples"
 os.makedirs(SAVE_PATH, exist_ok=True)
 # --------------------------- LOAD MODEL ---------------------------
-# model_name = "./pegasus-samsum-manual"
-# tokenizer = PegasusTokenizer.from_pretrained(model_name)
-# model = PegasusForConditionalGeneration.from_pretrained(model_name)
-model_path = r"C:\Users\varsh\OneDrive\Desktop\clonedproject\Text-morph---Advanced-Summarization-Using-AI\pegasus-samsum-manual"
-# model_path = "./backend/pegasus-samsum-manual"
-
-tokenizer = PegasusTokenizer.from_pretrained(model_path, local_files_only=True)
-model = PegasusForConditionalGeneration.from_pretrained(model_path, local_files_only=True)
-
-def chunk_text_tokenwise(text, max_chunk_tokens=512):
-    """Split text into chunks by token count for long input handling."""
-    tokens = tokenizer.tokenize(text)
-    chunks = []
-    for i in range(0, len(tokens), max_chunk_tokens):
-        chunk_tokens = tokens[i:i + max_chunk_tokens]
-        chunk_text = tokenizer.convert_tokens_to_string(chunk_tokens)
-        chunks.append(chunk_text)
-    return chunks
+# The checkpoint path comes from SUMMARIZATION_MODEL_PATH; the model is only
+# loaded by the registry the first time a summary is requested.
+MODEL_NAME = "summarizer"
 
-def generate_summary(
-    text,
+def get_tokenizer():
+    return registry.get_tokenizer(MODEL_NAME)
+
+def get_model():
+    return registry.get_model(MODEL_NAME)
+
+# Small draft model proposing tokens for speculative (assisted) decoding
+DRAFT_MODEL_NAME = "summarizer-draft"
+SUMMARY_USE_DRAFT = os.getenv("SUMMARY_USE_DRAFT", "0") == "1"
+
+def get_draft_model():
+    """The draft model, or None when SUMMARIZATION_DRAFT_MODEL_PATH is not set."""
+    if not registry.is_registered(DRAFT_MODEL_NAME):
+        return None
+    return registry.get_model(DRAFT_MODEL_NAME)
+
+# Encoder limit of the Pegasus checkpoints
+MAX_INPUT_TOKENS = 512
+# Sentences carried over from the previous chunk, measured in tokens
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "0"))
+
+def tokenize_document(text):
+    """Tokenize text once; the result carries input ids through the whole pipeline."""
+    if isinstance(text, TokenizedDocument):
+        return text
+    return TokenizedDocument(text, get_tokenizer())
+
+# "content" cuts chunks at hash-chosen sentences so boundaries survive edits
+# elsewhere in the text (see TokenizedDocument.content_chunks); "packed" fills
+# every chunk up to the encoder limit.
+SUMMARY_CHUNKING = os.getenv("SUMMARY_CHUNKING", "content")
+SUMMARY_CHUNK_MIN_TOKENS = int(os.getenv("SUMMARY_CHUNK_MIN_TOKENS", "320"))
+SUMMARY_CHUNK_DIVISOR = int(os.getenv("SUMMARY_CHUNK_DIVISOR", "4"))
+
+def chunk_text_tokenwise(text, max_chunk_tokens=MAX_INPUT_TOKENS, overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS,
+                         chunking=None):
+    """
+    Split text into sentence-aligned chunks of input ids for long input handling.
+    Overlap only applies to "packed" chunking.
+    """
+    document = tokenize_document(text)
+    if (chunking or SUMMARY_CHUNKING) == "content":
+        return document.content_chunks(
+            max_tokens=max_chunk_tokens,
+            min_tokens=SUMMARY_CHUNK_MIN_TOKENS,
+            divisor=SUMMARY_CHUNK_DIVISOR
+        )
+    return document.chunks(max_tokens=max_chunk_tokens, overlap_tokens=overlap_tokens)
+
+# --------------------------- MAP STAGE CONFIG ---------------------------
+# "batched" pads chunk encodings into a few generate calls, "threads" keeps the
+# one-generate-per-chunk ThreadPoolExecutor path so the two can be compared,
+# "processes" spreads chunks over forked, core-pinned workers (process_pool.py).
+SUMMARY_MAP_MODE = os.getenv("SUMMARY_MAP_MODE", "batched")
+SUMMARY_MAP_BATCH_SIZE = int(os.getenv("SUMMARY_MAP_BATCH_SIZE", "8"))
+
+BAD_WORDS = ["series", "part", "article", "copyright", "postmedia",
+             "http", "www", ".com", "email", "share", "click",
+             "including", "such as"]
+_bad_word_ids = None
+
+def get_bad_word_ids():
+    """Token ids of the words we never want in a summary (computed once)."""
+    global _bad_word_ids
+    if _bad_word_ids is None:
+        tokenizer = get_tokenizer()
+        _bad_word_ids = [tokenizer.encode(word, add_special_tokens=False) for word in BAD_WORDS]
+    return _bad_word_ids
+
+def build_generate_kwargs(
     max_length=40,
     min_length=10,
     length_penalty=1.0,
@@ -34,21 +98,14 @@ def generate_summary(
     no_repeat_ngram_size=None,
     repetition_penalty=None
 ):
-    """Generate a summary for a single text chunk."""
-    inputs = tokenizer([text], truncation=True, padding='longest', return_tensors="pt")
-
-    bad_words = ["series", "part", "article", "copyright", "postmedia",
-                 "http", "www", ".com", "email", "share", "click",
-                 "including", "such as"]
-    bad_word_ids = [tokenizer.encode(word, add_special_tokens=False) for word in bad_words]
-
+    """Collect the model.generate arguments shared by single and batched summaries."""
     generate_kwargs = dict(
         max_length=max_length,
         min_length=min_length,
         length_penalty=length_penalty,
         num_beams=num_beams,
         early_stopping=True,
-        bad_words_ids=bad_word_ids
+        bad_words_ids=get_bad_word_ids()
     )
     if temperature is not None:
         generate_kwargs["temperature"] = temperature
@@ -56,41 +113,324 @@ def generate_summary(
         generate_kwargs["no_repeat_ngram_size"] = no_repeat_ngram_size
     if repetition_penalty is not None:
         generate_kwargs["repetition_penalty"] = repetition_penalty
+    return generate_kwargs
+
+# --------------------------- DEADLINE-AWARE DECODING ---------------------------
+# Learns decode throughput from every generate call; used to fit requests
+# with a latency budget (deadline, in seconds) into that budget.
+summary_cost_model = DecodingCostModel()
+
+def current_queue_depth():
+    """Generate calls running now plus requests waiting in the micro-batcher."""
+    pending = _summary_scheduler.pending_count() if _summary_scheduler is not None else 0
+    return summary_cost_model.in_flight + pending
+
+def run_generate(model, input_ids, attention_mask, generate_kwargs):
+    """
+    model.generate holding a generate slot, with in-flight tracking and
+    cost-model updates. input_ids may be None when generate_kwargs carries
+    precomputed encoder_outputs. Calls waiting for a slot count as in flight
+    (so they show up in the queue depth) but not in the measured time.
+    """
+    with summary_cost_model.track():
+        with generate_slots:
+            started = time.perf_counter()
+            summary_ids = model.generate(input_ids, attention_mask=attention_mask, **generate_kwargs)
+            elapsed = time.perf_counter() - started
+    summary_cost_model.record(
+        attention_mask.shape[1],
+        summary_ids.shape[1],
+        generate_kwargs["num_beams"],
+        elapsed,
+        batch_size=attention_mask.shape[0]
+    )
+    return summary_ids
+
+def summarize_ids(ids, params, deadline=None, use_draft=SUMMARY_USE_DRAFT):
+    """
+    Summarize one tokenized input. With a deadline the cost model picks beam
+    width and max_length (falling back to greedy) so the call fits the budget.
+    With use_draft and a configured draft model, decoding is greedy and the
+    draft proposes tokens that the main model verifies in one forward pass.
+    Returns (summary, decision); decision is None without a deadline.
+    """
+    tokenizer, model = get_tokenizer(), get_model()
+    decision = None
+    if deadline is not None:
+        params, decision = summary_cost_model.plan(len(ids), params, deadline, queue_depth=current_queue_depth())
+    draft = get_draft_model() if use_draft else None
+    if draft is not None:
+        # Assisted generation only supports greedy search
+        params = dict(params, num_beams=1)
+    input_ids, attention_mask = pad_id_batch([ids[:MAX_INPUT_TOKENS]], tokenizer.pad_token_id)
+    generate_kwargs = build_generate_kwargs(**params)
+    if draft is not None:
+        generate_kwargs["assistant_model"] = draft
+    started = time.perf_counter()
+    summary_ids = run_generate(model, input_ids, attention_mask, generate_kwargs)
+    if decision is not None:
+        decision["actual_seconds"] = round(time.perf_counter() - started, 3)
+        decision["met_deadline"] = decision["actual_seconds"] <= deadline
+    return tokenizer.decode(summary_ids[0], skip_special_tokens=True), decision
 
-    summary_ids = model.generate(inputs.input_ids, **generate_kwargs)
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+def generate_summary(
+    text,
+    max_length=40,
+    min_length=10,
+    length_penalty=1.0,
+    num_beams=3,
+    temperature=None,
+    no_repeat_ngram_size=None,
+    repetition_penalty=None,
+    deadline=None,
+    return_config=False,
+    use_draft=SUMMARY_USE_DRAFT
+):
+    """
+    Generate a summary for a single text chunk.
+    deadline: optional latency budget in seconds (see summarize_ids).
+    use_draft: speculative decoding with the draft model, if one is configured.
+    return_config=True returns (summary, decision) with the configuration used.
+    """
+    tokenizer = get_tokenizer()
+    ids = tokenizer([text], truncation=True)["input_ids"][0]
+    params = dict(
+        max_length=max_length,
+        min_length=min_length,
+        length_penalty=length_penalty,
+        num_beams=num_beams,
+        temperature=temperature,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        repetition_penalty=repetition_penalty
+    )
+    summary, decision = summarize_ids(ids, params, deadline=deadline, use_draft=use_draft)
+    if return_config:
+        return summary, decision
     return summary
 
-def summarize_chunk(chunk, params):
-    """Summarize a single chunk with given parameters."""
-    return generate_summary(
-        chunk,
+def stream_summary(
+    text,
+    max_length=40,
+    min_length=10,
+    do_sample=False,
+    temperature=None,
+    top_p=None,
+    no_repeat_ngram_size=None,
+    repetition_penalty=None
+):
+    """
+    Yield the summary of a single text chunk piece by piece as tokens are
+    decoded. Uses greedy decoding, or sampling when do_sample is set.
+    """
+    tokenizer, model = get_tokenizer(), get_model()
+    ids = tokenize_document(text).input_ids(MAX_INPUT_TOKENS)
+    input_ids, attention_mask = pad_id_batch([ids], tokenizer.pad_token_id)
+    generate_kwargs = build_generate_kwargs(
+        max_length=max_length,
+        min_length=min_length,
+        no_repeat_ngram_size=no_repeat_ngram_size,
+        repetition_penalty=repetition_penalty
+    )
+    generate_kwargs.pop("early_stopping")
+    generate_kwargs.update(sampling_kwargs(do_sample, temperature, top_p))
+    yield from stream_generate(model, tokenizer, input_ids, attention_mask, generate_fn=run_generate, **generate_kwargs)
+
+def generate_summary_from_ids(id_lists, batch_size=SUMMARY_MAP_BATCH_SIZE, **params):
+    """
+    Summarize already-tokenized inputs with one padded generate call per batch.
+    Inputs are grouped into length buckets so short and long sequences are
+    not padded together; results come back in input order. Attention masks
+    keep padding out of the encoder, so each result matches what
+    generate_summary returns for the same text.
+    """
+    tokenizer, model = get_tokenizer(), get_model()
+    generate_kwargs = build_generate_kwargs(**params)
+    id_lists = [ids[:MAX_INPUT_TOKENS] for ids in id_lists]
+
+    def summarize_batch(batch):
+        input_ids, attention_mask = pad_id_batch(batch, tokenizer.pad_token_id)
+        summary_ids = run_generate(model, input_ids, attention_mask, generate_kwargs)
+        return tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+
+    return run_bucketed(
+        id_lists,
+        [len(ids) for ids in id_lists],
+        summarize_batch,
+        batch_size,
+        stats=get_padding_stats(MODEL_NAME)
+    )
+
+def generate_summary_batch(texts, batch_size=SUMMARY_MAP_BATCH_SIZE, **params):
+    """Summarize several texts with one padded generate call per batch."""
+    id_lists = [tokenize_document(text).input_ids(MAX_INPUT_TOKENS) for text in texts]
+    return generate_summary_from_ids(id_lists, batch_size=batch_size, **params)
+
+# --------------------------- CROSS-REQUEST BATCHING ---------------------------
+# Short summarize_text_by_level calls from concurrent users are pooled for up to
+# SUMMARY_BATCH_MAX_WAIT_MS and run as one padded batch per level.
+SUMMARY_MICROBATCH = os.getenv("SUMMARY_MICROBATCH", "1") == "1"
+SUMMARY_BATCH_MAX_SIZE = int(os.getenv("SUMMARY_BATCH_MAX_SIZE", "8"))
+SUMMARY_BATCH_MAX_WAIT_MS = float(os.getenv("SUMMARY_BATCH_MAX_WAIT_MS", "5"))
+_summary_scheduler = None
+
+def get_summary_scheduler():
+    """Shared micro-batch scheduler feeding generate_summary_from_ids."""
+    global _summary_scheduler
+    if _summary_scheduler is None:
+        _summary_scheduler = MicroBatchScheduler(
+            lambda id_lists, **params: generate_summary_from_ids(id_lists, batch_size=SUMMARY_BATCH_MAX_SIZE, **params),
+            max_batch_size=SUMMARY_BATCH_MAX_SIZE,
+            max_wait_ms=SUMMARY_BATCH_MAX_WAIT_MS
+        )
+    return _summary_scheduler
+
+def summarize_chunk(chunk_ids, params):
+    """Summarize a single tokenized chunk with given parameters."""
+    return generate_summary_from_ids(
+        [chunk_ids],
         max_length=params["max_length"],
         min_length=params["min_length"],
         length_penalty=params["length_penalty"],
         num_beams=params["num_beams"]
-    )
+    )[0]
+
+# --------------------------- PROCESS POOL ---------------------------
+# Forking a process that already runs other threads (micro-batcher, executor,
+# registry reaper, torch's OpenMP pool) can leave a lock held forever in the
+# child, so the pool is forked once at startup, before any of them exist.
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+def start_chunk_pool():
+    """
+    Load the model and fork the chunk worker pool, so workers share its
+    weights. Call once at process startup, before other threads are started.
+    """
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            if not fork_supported():
+                print("⚠️ Process pool needs fork; using batched map stage")
+                return None
+            if threading.active_count() > 1:
+                print(f"⚠️ Forking the chunk pool with {threading.active_count()} threads running")
+            get_model()
+            get_bad_word_ids()
+            _chunk_pool = ForkedModelPool()
+            print(f"🔹 Chunk pool started with {_chunk_pool.workers} workers")
+        return _chunk_pool
+
+def get_chunk_pool():
+    """The pool forked by start_chunk_pool(), or None if it was not started."""
+    with _chunk_pool_lock:
+        return _chunk_pool
+
+def shutdown_chunk_pool():
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is not None:
+            _chunk_pool.close()
+            _chunk_pool = None
+
+def discard_chunk_pool(pool):
+    """Drop a broken pool (if still current), so later calls use the batched map stage."""
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is pool:
+            _chunk_pool = None
+    pool.close()
+
+def summarize_chunk_task(task):
+    """
+    Process-pool entry point: task is (chunk_ids, params). Padding counters
+    and cost-model rates live in the worker, so the call's padding counts and
+    the worker's decode rate are sent back for the parent to merge.
+    """
+    chunk_ids, params = task
+    padding = get_padding_stats(MODEL_NAME)
+    before = padding.snapshot()
+    summary = summarize_chunk(chunk_ids, params)
+    after = padding.snapshot()
+    delta = {key: after[key] - before[key] for key in ("batches", "sequences", "real_tokens", "padded_slots")}
+    return summary, delta, summary_cost_model.decode_rate
+
+def map_chunks_in_pool(pool, chunks, params):
+    """Summarize chunks in the pool and fold the workers' metrics into this process."""
+    results = pool.map(summarize_chunk_task, [(chunk, params) for chunk in chunks])
+    padding = get_padding_stats(MODEL_NAME)
+    for _, delta, decode_rate in results:
+        padding.merge(delta)
+        summary_cost_model.blend(decode_rate)
+    return [summary for summary, _, _ in results]
 
 # --------------------------- LONG TEXT HANDLING ---------------------------
-def summarize_long_text(text, chunk_token_limit=512, summary_params=None):
+# Upper bound on reduce levels; past it the remaining summaries are truncated
+# into one final pass (flagged as "truncated" in the report).
+SUMMARY_REDUCE_MAX_DEPTH = int(os.getenv("SUMMARY_REDUCE_MAX_DEPTH", "6"))
+
+def chunk_params(summary_params):
+    """The subset of summary_params used for chunk and window summaries."""
+    return {key: summary_params[key] for key in ("max_length", "min_length", "length_penalty", "num_beams")}
+
+def group_into_windows(documents, max_tokens=MAX_INPUT_TOKENS):
     """
-    Summarize long text by splitting into chunks, summarizing each,
-    and then aggregating.
+    Greedily group consecutive tokenized summaries into windows whose joined
+    input ids (plus eos) fit the encoder. Returns lists of documents.
     """
-    if summary_params is None:
-        summary_params = {"max_length": 100, "min_length": 80, "length_penalty": 2.0, "num_beams": 6}
+    budget = max_tokens - 1
+    windows, current, current_len = [], [], 0
+    for document in documents:
+        if current and current_len + document.num_tokens > budget:
+            windows.append(current)
+            current, current_len = [], 0
+        current.append(document)
+        current_len += document.num_tokens
+    if current:
+        windows.append(current)
+    return windows
 
-    chunks = chunk_text_tokenwise(text, max_chunk_tokens=chunk_token_limit)
+def window_input_ids(window, max_tokens=MAX_INPUT_TOKENS):
+    ids = [token for document in window for sentence in document.sentence_ids for token in sentence]
+    return ids[:max_tokens - 1] + [window[0].eos_token_id]
 
-    # Parallel summarization
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        chunk_summaries = list(executor.map(lambda c: summarize_chunk(c, summary_params), chunks))
+def reduce_summaries(summaries, summary_params, max_depth=SUMMARY_REDUCE_MAX_DEPTH, report=None):
+    """
+    Recursively reduce chunk summaries: group them into encoder-sized windows,
+    summarize every window of a level in one batched pass, and repeat until a
+    single window remains, which gets the final (repetition-penalized) pass.
+    Per-level fan-in, token counts and timings are appended to report["levels"].
+    """
+    if report is None:
+        report = {}
+    report.setdefault("levels", [])
+    depth = 0
+    while True:
+        documents = [tokenize_document(summary) for summary in summaries]
+        windows = group_into_windows(documents)
+        if len(windows) == 1 or depth >= max_depth:
+            break
 
-    aggregated_summary = " ".join(chunk_summaries)
+        depth += 1
+        started = time.perf_counter()
+        summaries = generate_summary_from_ids(
+            [window_input_ids(window) for window in windows],
+            **chunk_params(summary_params)
+        )
+        report["levels"].append({
+            "level": depth,
+            "inputs": len(documents),
+            "windows": len(windows),
+            "fan_in": max(len(window) for window in windows),
+            "input_tokens": sum(document.num_tokens for document in documents),
+            "token_budget": MAX_INPUT_TOKENS,
+            "seconds": round(time.perf_counter() - started, 3),
+        })
 
     # Final hierarchical summary
-    final_summary = generate_summary(
-        aggregated_summary,
+    started = time.perf_counter()
+    final_window = [document for window in windows for document in window]
+    final_summary = generate_summary_from_ids(
+        [window_input_ids(final_window)],
         max_length=summary_params["max_length"],
         min_length=summary_params["min_length"],
         length_penalty=summary_params["length_penalty"],
@@ -98,25 +438,287 @@ def summarize_long_text(text, chunk_token_limit=512, summary_params=None):
         no_repeat_ngram_size=4,
         repetition_penalty=2.5,
         num_beams=summary_params["num_beams"]
-    )
+    )[0]
+    final_tokens = sum(document.num_tokens for document in final_window)
+    report["levels"].append({
+        "level": depth + 1,
+        "inputs": len(final_window),
+        "windows": 1,
+        "fan_in": len(final_window),
+        "input_tokens": final_tokens,
+        "token_budget": MAX_INPUT_TOKENS,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+    report["depth"] = depth + 1
+    report["truncated"] = final_tokens > MAX_INPUT_TOKENS - 1
+    return final_summary
+
+# --------------------------- EXTRACTIVE PRE-REDUCTION ---------------------------
+# Very long inputs can first be cut down to their most salient sentences so
+# the abstractive pass costs a bounded number of model calls.
+SUMMARY_EXTRACTIVE = os.getenv("SUMMARY_EXTRACTIVE", "0") == "1"
+EXTRACTIVE_METHOD = os.getenv("EXTRACTIVE_METHOD", "textrank")
+# Token budget kept per level (0 disables the stage for that level)
+EXTRACTIVE_BUDGETS = {
+    "Easy": int(os.getenv("EXTRACTIVE_BUDGET_EASY", "1536")),
+    "Medium": int(os.getenv("EXTRACTIVE_BUDGET_MEDIUM", "2560")),
+    "Long": int(os.getenv("EXTRACTIVE_BUDGET_LONG", "4096")),
+}
+
+def extractive_reduce(document, token_budget, method=EXTRACTIVE_METHOD):
+    """Keep the most salient sentences of a tokenized document within token_budget."""
+    if not token_budget or document.num_tokens <= token_budget:
+        return document
+    token_counts = [len(ids) for ids in document.sentence_ids]
+    return document.subset(select_salient(document.sentences, token_counts, token_budget, method=method))
+
+def map_chunks(chunks, summary_params, map_mode):
+    """Summarize every chunk with the chosen map stage."""
+    if not chunks:
+        return []
+    if map_mode == "batched":
+        return generate_summary_from_ids(chunks, **chunk_params(summary_params))
+    if map_mode == "threads":
+        # Parallel summarization
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            return list(executor.map(lambda c: summarize_chunk(c, summary_params), chunks))
+    if map_mode == "processes":
+        pool = get_chunk_pool()
+        if pool is not None:
+            try:
+                return map_chunks_in_pool(pool, chunks, chunk_params(summary_params))
+            except BrokenProcessPool:
+                # Never re-fork here: other threads are running by now
+                print("⚠️ A chunk pool worker died; using batched map stage from now on")
+                discard_chunk_pool(pool)
+        return generate_summary_from_ids(chunks, **chunk_params(summary_params))
+    raise ValueError(f"Unknown map_mode: {map_mode}")
+
+# Chunk summaries are memoized on their input ids, so re-summarizing an edited
+# document only runs the chunks that changed (plus the reduce step).
+SUMMARY_CHUNK_MEMO = os.getenv("SUMMARY_CHUNK_MEMO", "1") == "1"
+
+def map_chunks_memoized(chunks, summary_params, map_mode, progress=None):
+    """
+    map_chunks with a per-chunk lookup in the shared result cache.
+    progress, if given, is called as progress(chunks_done, total_chunks)
+    after every batch of SUMMARY_MAP_BATCH_SIZE chunks (it may raise to abort).
+    Returns (summaries, number of chunks served from the cache).
+    """
+    keys = None
+    summaries = [None] * len(chunks)
+    if SUMMARY_CHUNK_MEMO:
+        cache = get_result_cache()
+        params = chunk_params(summary_params)
+        revision = registry.revision(MODEL_NAME)
+        keys = [make_ids_cache_key("summary-chunk", chunk, params, revision) for chunk in chunks]
+        summaries = [cache.get(key) for key in keys]
+    missing = [i for i, summary in enumerate(summaries) if summary is None]
+    reused = len(chunks) - len(missing)
+    if progress is not None:
+        progress(reused, len(chunks))
+
+    step = max(1, SUMMARY_MAP_BATCH_SIZE if progress is not None else len(missing))
+    for start in range(0, len(missing), step):
+        part = missing[start:start + step]
+        for index, summary in zip(part, map_chunks([chunks[i] for i in part], summary_params, map_mode)):
+            summaries[index] = summary
+            if keys is not None:
+                cache.put(keys[index], summary)
+        if progress is not None:
+            progress(reused + start + len(part), len(chunks))
+    return summaries, reused
+
+def summarize_long_text(text, chunk_token_limit=MAX_INPUT_TOKENS, summary_params=None, map_mode=None,
+                        overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS, return_report=False,
+                        extractive_budget=None, progress=None):
+    """
+    Summarize long text by splitting into chunks, summarizing each,
+    and then reducing the chunk summaries level by level.
+    text may be a string or a TokenizedDocument.
+    map_mode: "batched" (default), "threads" for the per-chunk path, or
+    "processes" for the worker pool forked by start_chunk_pool() (batched
+    if it was not started).
+    extractive_budget: if set, first keep only the most salient sentences
+    up to this many tokens.
+    Chunk summaries are memoized (SUMMARY_CHUNK_MEMO), so after a local edit
+    only the changed chunks and the reduce step run again.
+    progress: optional progress(chunks_done, total_chunks) callback.
+    With return_report=True returns (summary, report) where the report lists
+    the chunk count, reused chunks, reduce depth and per-level fan-in/token
+    budgets/timings.
+    """
+    if summary_params is None:
+        summary_params = {"max_length": 100, "min_length": 80, "length_penalty": 2.0, "num_beams": 6}
+    map_mode = map_mode or SUMMARY_MAP_MODE
+    if map_mode == "processes" and get_chunk_pool() is None:
+        # Never fork from inside a request; the pool must come from startup
+        print("⚠️ Chunk pool not started; using batched map stage")
+        map_mode = "batched"
+
+    document = tokenize_document(text)
+    source_tokens = document.num_tokens
+    if extractive_budget:
+        document = extractive_reduce(document, extractive_budget)
+    chunks = chunk_text_tokenwise(document, max_chunk_tokens=chunk_token_limit, overlap_tokens=overlap_tokens)
+
+    started = time.perf_counter()
+    chunk_summaries, reused = map_chunks_memoized(chunks, summary_params, map_mode, progress=progress)
+
+    report = {
+        "source_tokens": source_tokens,
+        "extracted_tokens": document.num_tokens,
+        "chunks": len(chunks),
+        "map": {
+            "mode": map_mode,
+            "input_tokens": sum(len(chunk) for chunk in chunks),
+            "token_budget": chunk_token_limit,
+            "reused": reused,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+    final_summary = reduce_summaries(chunk_summaries, summary_params, report=report)
+    if return_report:
+        return final_summary, report
     return final_summary
 
 # --------------------------- LEVEL-BASED INTERFACE ---------------------------
-def summarize_text_by_level(text, level="Easy"):
+SUMMARY_LEVELS = {
+    "Easy": {"max_length": 40, "min_length": 10, "length_penalty": 1.0, "num_beams": 3},
+    "Medium": {"max_length": 70, "min_length": 30, "length_penalty": 1.5, "num_beams": 5},
+    "Long": {"max_length": 120, "min_length": 50, "length_penalty": 2.0, "num_beams": 6}
+}
+
+def get_level_params(level):
+    """Generation parameters for a summary level (unknown levels fall back to Easy)."""
+    return dict(SUMMARY_LEVELS.get(level, SUMMARY_LEVELS["Easy"]))
+
+@cached_result("summary", lambda: registry.revision(MODEL_NAME))
+def summarize_text_by_level(text, level="Easy", deadline=None):
     """
     Generate summary based on user-selected level.
     Levels: Easy, Medium, Long
+    deadline: optional latency budget in seconds for inputs within the encoder limit.
     """
-    levels = {
-        "Easy": {"max_length": 40, "min_length": 10, "length_penalty": 1.0, "num_beams": 3},
-        "Medium": {"max_length": 70, "min_length": 30, "length_penalty": 1.5, "num_beams": 5},
-        "Long": {"max_length": 120, "min_length": 50, "length_penalty": 2.0, "num_beams": 6}
-    }
+    return summarize_document_by_level(tokenize_document(text), level, deadline=deadline)
 
-    params = levels.get(level, levels["Easy"])
+def summarize_document_by_level(document, level="Easy", deadline=None):
+    """summarize_text_by_level for an already tokenized document, without the result cache."""
+    params = get_level_params(level)
+    if SUMMARY_EXTRACTIVE and document.num_tokens > MAX_INPUT_TOKENS:
+        document = extractive_reduce(document, EXTRACTIVE_BUDGETS.get(level, 0))
 
     # Use long text summarization if text has more than 512 tokens
-    if len(tokenizer.tokenize(text)) > 512:
-        return summarize_long_text(text, summary_params=params)
+    if document.num_tokens > MAX_INPUT_TOKENS:
+        return summarize_long_text(document, summary_params=params)
+    elif deadline is not None:
+        return summarize_ids(document.input_ids(MAX_INPUT_TOKENS), params, deadline=deadline)[0]
+    elif SUMMARY_MICROBATCH:
+        return get_summary_scheduler().run(document.input_ids(MAX_INPUT_TOKENS), **params)
     else:
-        return generate_summary(text, **params)
+        return generate_summary_from_ids([document.input_ids(MAX_INPUT_TOKENS)], **params)[0]
+
+def summarize_texts_by_level(texts, level="Easy", batch_size=SUMMARY_MAP_BATCH_SIZE):
+    """
+    Summarize many independent texts at one level, bypassing the result cache.
+    Inputs within the encoder limit share length-bucketed batches; longer ones
+    go through summarize_long_text one by one. Results keep input order.
+    """
+    params = get_level_params(level)
+    documents = [tokenize_document(text) for text in texts]
+    short = [i for i, document in enumerate(documents) if document.num_tokens <= MAX_INPUT_TOKENS]
+    summaries = [None] * len(documents)
+    batch = generate_summary_from_ids(
+        [documents[i].input_ids(MAX_INPUT_TOKENS) for i in short],
+        batch_size=batch_size,
+        **params
+    ) if short else []
+    for index, summary in zip(short, batch):
+        summaries[index] = summary
+    for index, document in enumerate(documents):
+        if summaries[index] is None:
+            summaries[index] = summarize_long_text(document, summary_params=params)
+    return summaries
+
+
+def stream_summary_by_level(text, level="Easy", do_sample=False, temperature=None, top_p=None):
+    """
+    Streaming counterpart of summarize_text_by_level: same length limits, but
+    single-beam decoding so partial text can be shown immediately. Inputs
+    longer than the encoder limit are truncated.
+    """
+    params = get_level_params(level)
+    yield from stream_summary(
+        text,
+        max_length=params["max_length"],
+        min_length=params["min_length"],
+        do_sample=do_sample,
+        temperature=temperature,
+        top_p=top_p
+    )
+
+# --------------------------- ENCODE ONCE, DECODE MANY ---------------------------
+# Encoder outputs of recent inputs are kept for ENCODER_CACHE_TTL seconds so a
+# follow-up request for another level of the same text skips the encoder.
+ENCODER_CACHE_TTL = float(os.getenv("ENCODER_CACHE_TTL", "120"))
+ENCODER_CACHE_SIZE = int(os.getenv("ENCODER_CACHE_SIZE", "8"))
+_encoder_cache = OrderedDict()
+_encoder_lock = threading.Lock()
+
+def get_encoder_state(document):
+    """Return (last_hidden_state, attention_mask) for a short document, encoding at most once per TTL."""
+    import torch
+    key = make_cache_key("encoder", document.text, {}, registry.revision(MODEL_NAME))
+    now = time.monotonic()
+    with _encoder_lock:
+        for stale in [k for k, entry in _encoder_cache.items() if entry[0] <= now]:
+            del _encoder_cache[stale]
+        if key in _encoder_cache:
+            _encoder_cache.move_to_end(key)
+            return _encoder_cache[key][1:]
+
+    tokenizer, model = get_tokenizer(), get_model()
+    input_ids, attention_mask = pad_id_batch([document.input_ids(MAX_INPUT_TOKENS)], tokenizer.pad_token_id)
+    with generate_slots, torch.no_grad():
+        hidden = model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+    with _encoder_lock:
+        _encoder_cache[key] = (now + ENCODER_CACHE_TTL, hidden, attention_mask)
+        while len(_encoder_cache) > ENCODER_CACHE_SIZE:
+            _encoder_cache.popitem(last=False)
+    return hidden, attention_mask
+
+@cached_result("summary_levels", lambda: registry.revision(MODEL_NAME))
+def summarize_levels(text, levels=("Easy", "Medium", "Long"), deadline=None):
+    """
+    Summarize text at several levels, running the encoder only once and then
+    decoding each level's configuration against the shared encoder outputs.
+    Returns {level: summary}. Inputs over the encoder limit are summarized
+    level by level from the same tokenized document.
+    deadline: optional latency budget in seconds for all levels together;
+    each level is planned with an equal share of the time left.
+    """
+    from transformers.modeling_outputs import BaseModelOutput
+
+    levels = list(levels)
+    document = tokenize_document(text)
+    if document.num_tokens > MAX_INPUT_TOKENS:
+        return {level: summarize_document_by_level(document, level) for level in levels}
+
+    started = time.perf_counter()
+    tokenizer, model = get_tokenizer(), get_model()
+    hidden, attention_mask = get_encoder_state(document)
+    summaries = {}
+    for done, level in enumerate(levels):
+        params = get_level_params(level)
+        if deadline is not None:
+            share = (deadline - (time.perf_counter() - started)) / (len(levels) - done)
+            params, _ = summary_cost_model.plan(
+                attention_mask.shape[1], params, max(share, 0.0), queue_depth=current_queue_depth()
+            )
+        generate_kwargs = build_generate_kwargs(**params)
+        # generate expands encoder_outputs in place for beam search, so hand it a fresh wrapper
+        generate_kwargs["encoder_outputs"] = BaseModelOutput(last_hidden_state=hidden)
+        summary_ids = run_generate(model, None, attention_mask, generate_kwargs)
+        summaries[level] = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+    return summaries
@@ -20,8 +20,8 @@ backend_dir = os.path.join(parent_dir, "backend")
 sys.path.append(backend_dir)
 
 # --------------------------- BACKEND IMPORTS ---------------------------
-from backend.api.paraphrasing import generate_paraphrase, paraphrase_long_text
-from backend.api.summarization import summarize_text_by_level
+# Models live in the FastAPI inference service; this process only calls it
+from inference_client import summarize_levels, generate_paraphrase, generate_paraphrase_candidates
 from backend.api.database import (
     save_generated_text, 
     fetch_all_users, 
@@ -225,7 +225,8 @@ def show_dashboard():
 
         for lvl in levels:
             if st.button(f"Generate {lvl} Summary"):
-                summary = summarize_text_by_level(text, lvl)
+                # Levels share one encoder pass for the same input text
+                summary = summarize_levels(text, [lvl])[lvl]
                 st.session_state[f"summary_{lvl}"] = summary
 
             if f"summary_{lvl}" in st.session_state:
@@ -365,7 +366,7 @@ def show_dashboard():
 
         # --- Summary Evaluation ---
         if st.button("Generate Evaluation Summary"):
-            candidate = summarize_text_by_level(text, "Medium")
+            candidate = summarize_levels(text, ["Medium"])["Medium"]
             st.session_state.eval_summary_candidate = candidate
             st.text_area("Generated Summary", candidate, height=200)
 
@@ -384,7 +385,7 @@ def show_dashboard():
 
         # --- Compare with Reference Summary ---
         if "eval_summary_candidate" in st.session_state and st.button("Compare with Reference Summary"):
-            reference = summarize_text_by_level(text, "Long")
+            reference = summarize_levels(text, ["Long"])["Long"]
             candidate = st.session_state.eval_summary_candidate
             radar_metrics, bottom_values = compute_metrics(reference, candidate)
 
@@ -401,8 +402,12 @@ def show_dashboard():
 
         # --- Paraphrase Evaluation ---
         if st.button("Generate Evaluation Paraphrase"):
-            candidate = generate_paraphrase(text, max_length=120)
+            # One generation pass: the best-ranked candidate is evaluated
+            # against the runner-up as reference
+            ranked = generate_paraphrase_candidates(text, num_candidates=4, max_length=200)
+            candidate = ranked[0]["text"] if ranked else ""
             st.session_state.eval_paraphrase_candidate = candidate
+            st.session_state.eval_paraphrase_reference = ranked[1]["text"] if len(ranked) > 1 else candidate
             st.text_area("Generated Paraphrase", candidate, height=200)
 
         # 🌐 Translate Evaluation Paraphrase
@@ -420,7 +425,7 @@ def show_dashboard():
 
         # --- Compare with Reference Paraphrase ---
         if "eval_paraphrase_candidate" in st.session_state and st.button("Compare with Reference Paraphrase"):
-            reference = generate_paraphrase(text, max_length=200)
+            reference = st.session_state.eval_paraphrase_reference
             candidate = st.session_state.eval_paraphrase_candidate
             radar_metrics, bottom_values = compute_metrics(reference, candidate)
 
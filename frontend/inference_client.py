@@ -0,0 +1,56 @@
+import os
+import httpx
+import streamlit as st
+
+API_URL = "http://localhost:8000"
+# Long documents can take minutes to summarize
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "600"))
+
+# One connection pool per Streamlit process, reused across reruns
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = httpx.Client(base_url=API_URL, timeout=INFERENCE_TIMEOUT)
+    return _client
+
+
+# ------------------ Backend Calls ------------------
+def _post(path, payload):
+    """POST to the inference service; returns the JSON body or None after showing the error."""
+    try:
+        response = get_client().post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        try:
+            detail = e.response.json().get("detail", "Unknown error")
+        except Exception:
+            # Proxies and crashed workers answer with plain text or HTML
+            detail = e.response.text or f"HTTP {e.response.status_code}"
+        st.error(f"Inference failed: {detail}")
+    except httpx.RequestError as e:
+        st.error(f"Network error: {str(e)}")
+    return None
+
+def summarize_levels(text, levels=("Easy", "Medium", "Long")):
+    """Calls backend /summarize; returns {level: summary}."""
+    data = _post("/summarize", {"text": text, "levels": list(levels)})
+    if data is None:
+        return {level: "" for level in levels}
+    return data["summaries"]
+
+def generate_paraphrase(text, max_length=100, num_beams=5):
+    """Calls backend /paraphrase; returns the paraphrased text."""
+    data = _post("/paraphrase", {"text": text, "max_length": max_length, "num_beams": num_beams})
+    return data["paraphrase"] if data else ""
+
+def generate_paraphrase_candidates(text, num_candidates=4, max_length=100):
+    """Calls backend /paraphrase/candidates; returns the ranked candidate list."""
+    data = _post("/paraphrase/candidates", {
+        "text": text,
+        "num_candidates": num_candidates,
+        "max_length": max_length
+    })
+    return data["candidates"] if data else []